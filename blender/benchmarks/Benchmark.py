@@ -0,0 +1,212 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+'''
+Parsing benchmarks on synthetic files, run from the `blender` folder:
+
+    python -m benchmarks.Benchmark --vertices 100000 --save-baseline
+    python -m benchmarks.Benchmark --vertices 100000
+
+The second run compares every stage against the saved baseline and
+exits with 1 if any of them got slower than the threshold allows.
+'''
+
+from time import perf_counter
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from io_scene_dava.FileIO.KA import readKA1
+from io_scene_dava.FileIO.SCG import readSCGHeader, readSCG
+from io_scene_dava.FileIO.StreamBuffer import MemoryBuffer
+from io_scene_dava.Geometry.PolygonGroup import PolygonGroup, VertexFormat, IndexTypes, PrimitiveTypes
+
+from .Synthetic import writeSyntheticSCG, writeSyntheticKA, addGeneratorArguments, getGeneratorOptions
+
+# Baselines depend on the machine, they're kept out of the source tree
+DEFAULT_BASELINE = os.path.join(tempfile.gettempdir(), "io_scene_dava_benchmark", "baseline.json")
+# Slowdowns smaller than this (in seconds) are timer noise, e.g. in the header stage
+MIN_REGRESSION = 1e-4
+
+'''
+Stages
+
+Each stage takes the output of the setup and returns nothing, only the stage itself is timed
+'''
+def benchmarkHeader(data):
+    readSCGHeader(MemoryBuffer(data))
+
+def benchmarkParse(data):
+    readSCG(MemoryBuffer(data))
+
+def benchmarkVertices(nodes):
+    for node in nodes:
+        vertexFormat = VertexFormat(node["vertexFormat"])
+        vertexData = np.frombuffer(node["vertices"], dtype=vertexFormat.dtype, count=node["vertexCount"])
+        # Separate contiguous arrays like the mesh builder uses
+        for attribute in vertexFormat.attributes:
+            np.ascontiguousarray(vertexData[attribute])
+
+def benchmarkIndices(nodes):
+    for node in nodes:
+        indices = np.frombuffer(node["indices"], dtype=IndexTypes.DTYPES[node["indexFormat"]], count=node["indexCount"])
+        indices.astype(np.int32)
+
+def benchmarkPrimitives(groups):
+    for group in groups:
+        match group.primitiveType:
+            case PrimitiveTypes.TRIANGLESTRIP:
+                group.getTriangleStrip()
+            case PrimitiveTypes.LINELIST:
+                group.getLineList()
+            case _:
+                group.getTriangleList()
+
+def benchmarkArchive(data):
+    readKA1(MemoryBuffer(data))
+
+class Stage:
+    def __init__(self, name, function, argument, size, vertexCount):
+        self.name = name
+        self.function = function
+        self.argument = argument
+        # Bytes and vertices the stage goes through, for throughput
+        self.size = size
+        self.vertexCount = vertexCount
+        self.time = None
+
+    # Best of repeat runs, anything slower than that is noise
+    def run(self, repeat):
+        times = []
+        for _ in range(repeat):
+            start = perf_counter()
+            self.function(self.argument)
+            times.append(perf_counter() - start)
+        self.time = min(times)
+
+def getStages(scgData, archiveData):
+    nodes = list(readSCG(MemoryBuffer(scgData)).values())
+    groups = [PolygonGroup(node) for node in nodes]
+
+    vertexCount = sum(len(group.vertexData) for group in groups)
+    vertexSize = sum(group.vertexData.nbytes for group in groups)
+    indexSize = sum(group.indices.nbytes for group in groups)
+
+    return [
+        Stage("header", benchmarkHeader, scgData, 16, 0),
+        Stage("parse", benchmarkParse, scgData, len(scgData), vertexCount),
+        Stage("vertices", benchmarkVertices, nodes, vertexSize, vertexCount),
+        Stage("indices", benchmarkIndices, nodes, indexSize, vertexCount),
+        Stage("primitives", benchmarkPrimitives, groups, indexSize, vertexCount),
+        Stage("archive", benchmarkArchive, archiveData, len(archiveData), 0)
+    ]
+
+'''
+Baseline
+'''
+def loadBaseline(filepath):
+    with open(filepath, "r") as file:
+        return json.load(file)
+
+def saveBaseline(filepath, options, stages):
+    baseline = {
+        "options": options,
+        "stages": {stage.name: stage.time for stage in stages}
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+    with open(filepath, "w") as file:
+        json.dump(baseline, file, indent=4)
+
+# Names of the stages that are slower than the baseline by more than threshold (0.1 is 10%)
+def findRegressions(baseline, stages, threshold):
+    regressions = []
+    for stage in stages:
+        baselineTime = baseline["stages"].get(stage.name)
+        if baselineTime is None:
+            continue
+        if stage.time > baselineTime * (1 + threshold) and stage.time - baselineTime > MIN_REGRESSION:
+            regressions.append(stage.name)
+
+    return regressions
+
+'''
+Report
+'''
+def formatStage(stage, baseline):
+    line = f"{stage.name:<12}{stage.time * 1e3:>10.3f} ms"
+    if stage.time > 0:
+        line += f"{stage.size / stage.time / 1e6:>12.1f} MB/s"
+        if stage.vertexCount:
+            line += f"{stage.vertexCount / stage.time / 1e6:>10.2f} Mvertices/s"
+    if baseline is not None and stage.name in baseline["stages"]:
+        change = stage.time / baseline["stages"][stage.name] - 1
+        line += f"  ({change:+.1%} vs baseline)"
+
+    return line
+
+'''
+CLI
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DAVA readers on synthetic files")
+    addGeneratorArguments(parser)
+    parser.add_argument("--keys", type=int, default=10000, help="Key count of the synthetic archive")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each stage, the fastest one counts")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed slowdown before a stage counts as a regression")
+    args = parser.parse_args(argv)
+
+    options = getGeneratorOptions(args)
+    options["keyCount"] = args.keys
+
+    with tempfile.TemporaryDirectory() as directory:
+        scgPath = os.path.join(directory, "benchmark.scg")
+        archivePath = os.path.join(directory, "benchmark.ka")
+        writeSyntheticSCG(scgPath, **getGeneratorOptions(args))
+        writeSyntheticKA(archivePath, args.keys, args.seed)
+        with open(scgPath, "rb") as file:
+            scgData = file.read()
+        with open(archivePath, "rb") as file:
+            archiveData = file.read()
+
+    stages = getStages(scgData, archiveData)
+    for stage in stages:
+        stage.run(args.repeat)
+
+    baseline = None
+    if not args.save_baseline and os.path.isfile(args.baseline):
+        baseline = loadBaseline(args.baseline)
+        if baseline["options"] != json.loads(json.dumps(options)):
+            print("Warning: baseline was made with different options, not comparing")
+            baseline = None
+
+    print(f"{len(scgData) / 1e6:.1f} MB SCG, {len(archiveData) / 1e6:.1f} MB archive, best of {args.repeat}")
+    for stage in stages:
+        print(formatStage(stage, baseline))
+
+    if args.save_baseline:
+        saveBaseline(args.baseline, options, stages)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if baseline is not None:
+        regressions = findRegressions(baseline, stages, args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
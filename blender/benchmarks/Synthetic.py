@@ -0,0 +1,150 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+'''
+Synthetic DAVA files for benchmarking, run from the `blender` folder:
+
+    python -m benchmarks.Synthetic test.scg --groups 8 --vertices 50000
+'''
+
+import argparse
+
+import numpy as np
+
+from io_scene_dava.FileIO.KA import KeyedArchive, writeKA1
+from io_scene_dava.FileIO.SCG import writeSCG
+from io_scene_dava.FileIO.StreamBuffer import StreamBuffer
+from io_scene_dava.Geometry.PolygonGroup import PolygonGroup, VertexAttributes, PrimitiveTypes, IndexTypes
+
+INDEX_FORMATS = {
+    "auto": None,
+    "uint16": IndexTypes.UINT16,
+    "uint32": IndexTypes.UINT32
+}
+
+PRIMITIVE_TYPES = {
+    "list": PrimitiveTypes.TRIANGLELIST,
+    "strip": PrimitiveTypes.TRIANGLESTRIP,
+    "lines": PrimitiveTypes.LINELIST
+}
+
+'''
+Generators
+'''
+# Random values for every attribute, colours are bytes and everything else floats
+def generateAttributes(rng, vertexCount, attributes):
+    components = {name: (componentType, count) for name, componentType, count in VertexAttributes}
+
+    arrays = {}
+    for attribute in attributes:
+        componentType, count = components[attribute]
+        if componentType == "u1":
+            arrays[attribute] = rng.integers(0, 256, (vertexCount, count), dtype=np.uint8)
+        else:
+            arrays[attribute] = rng.random((vertexCount, count), dtype=np.float32)
+        if count == 1:
+            arrays[attribute] = arrays[attribute].ravel()
+
+    return arrays
+
+# Random primitives, about two triangles per vertex like a closed mesh
+def generateIndices(rng, vertexCount, primitiveType):
+    match primitiveType:
+        case PrimitiveTypes.TRIANGLELIST:
+            indexCount = vertexCount * 6
+        case PrimitiveTypes.TRIANGLESTRIP:
+            indexCount = vertexCount * 2 + 2
+        case PrimitiveTypes.LINELIST:
+            indexCount = vertexCount * 2
+
+    return rng.integers(0, vertexCount, indexCount, dtype=np.uint32)
+
+def generatePolygonGroups(groupCount, vertexCount, attributes=("VERTEX", "NORMAL", "TEXCOORD0"), indexFormat=None, primitiveType=PrimitiveTypes.TRIANGLELIST, seed=0):
+    if "VERTEX" not in attributes:
+        raise ValueError("Polygon groups need the VERTEX attribute")
+    if indexFormat == IndexTypes.UINT16 and vertexCount > IndexTypes.UINT16_LIMIT:
+        raise ValueError(f"{vertexCount} vertices can't be addressed with 16 bit indices")
+
+    rng = np.random.default_rng(seed)
+    for groupID in range(groupCount):
+        yield PolygonGroup.fromArrays(
+            groupID,
+            generateAttributes(rng, vertexCount, attributes),
+            generateIndices(rng, vertexCount, primitiveType),
+            primitiveType, indexFormat
+        )
+
+def writeSyntheticSCG(filepath, groupCount, vertexCount, attributes=("VERTEX", "NORMAL", "TEXCOORD0"), indexFormat=None, primitiveType=PrimitiveTypes.TRIANGLELIST, seed=0):
+    with open(filepath, "wb") as file:
+        writeSCG(StreamBuffer(file), (
+            group.toArchive() for group in generatePolygonGroups(
+                groupCount, vertexCount, attributes, indexFormat, primitiveType, seed
+            )
+        ))
+
+# Scene node like archive of many small values (names, flags,
+# transforms, nested archives) to exercise the per key paths of readKA1
+def generateArchive(keyCount, seed=0):
+    rng = np.random.default_rng(seed)
+
+    keys = []
+    values = []
+    for i in range(keyCount):
+        match i % 5:
+            case 0:
+                value = f"node{i}"
+            case 1:
+                value = int(rng.integers(0, 1 << 31))
+            case 2:
+                value = bool(i & 8)
+            case 3:
+                value = float(rng.random())
+            case 4:
+                value = KeyedArchive(("name", "flags"), (f"component{i}", i))
+        keys.append(f"key{i}")
+        values.append(value)
+
+    return KeyedArchive(keys, values)
+
+def writeSyntheticKA(filepath, keyCount, seed=0):
+    with open(filepath, "wb") as file:
+        writeKA1(StreamBuffer(file), generateArchive(keyCount, seed))
+
+'''
+CLI
+'''
+def addGeneratorArguments(parser):
+    parser.add_argument("--groups", type=int, default=8, help="Polygon group count")
+    parser.add_argument("--vertices", type=int, default=50000, help="Vertex count of each group")
+    parser.add_argument("--attributes", default="VERTEX,NORMAL,TEXCOORD0", help="Comma separated vertex attributes, e.g. VERTEX,NORMAL,COLOR")
+    parser.add_argument("--index-format", choices=INDEX_FORMATS.keys(), default="auto", help="Index format")
+    parser.add_argument("--primitive", choices=PRIMITIVE_TYPES.keys(), default="list", help="Primitive type")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+def getGeneratorOptions(args):
+    return {
+        "groupCount": args.groups,
+        "vertexCount": args.vertices,
+        "attributes": tuple(args.attributes.split(",")),
+        "indexFormat": INDEX_FORMATS[args.index_format],
+        "primitiveType": PRIMITIVE_TYPES[args.primitive],
+        "seed": args.seed
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic .scg file")
+    parser.add_argument("output", help="File to write")
+    addGeneratorArguments(parser)
+    args = parser.parse_args(argv)
+
+    writeSyntheticSCG(args.output, **getGeneratorOptions(args))
+
+if __name__ == "__main__":
+    main()
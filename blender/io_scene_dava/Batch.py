@@ -0,0 +1,235 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+'''
+Headless batch conversion of whole pack directories, run from the `blender` folder:
+
+    python -m io_scene_dava.Batch packs/3d output/ --jobs 8
+'''
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+import argparse
+import os
+
+import numpy as np
+
+from .FileIO.SCG import SCGFile, getContentHash
+from .FileIO.Cache import DecodeCache
+from .FileIO.DVPL import DVPLBuffer, stripDVPL
+from .FileIO.Store import GeometryStore
+from .FileIO.SC2 import SC2File
+from .FileIO.GLTF import writeGLB
+from .Geometry.PolygonGroup import PolygonGroup
+
+'''
+Results
+'''
+class BatchResult:
+    def __init__(self, filepath, outputPath):
+        self.filepath = filepath
+        self.outputPath = outputPath
+        self.size = 0
+        self.groupCount = 0
+        self.vertexCount = 0
+        # Groups that were already in the geometry store
+        self.sharedCount = 0
+        self.time = 0.0
+        self.error = None
+
+'''
+Writers
+'''
+# Every group is stored as its raw vertex records (structured array with
+# one field per attribute), its indices and a small header
+def writeNPZ(outputPath, polyGroups, filepath):
+    arrays = {}
+    for groupID, group in polyGroups.items():
+        arrays[f"{groupID}_vertices"] = group.vertexData
+        arrays[f"{groupID}_indices"] = group.indices
+        arrays[f"{groupID}_header"] = np.array([
+            group.vertexFormat.format, group.indexFormat, group.primitiveType, group.primitiveCount
+        ], dtype=np.uint32)
+
+    np.savez(outputPath, **arrays)
+
+# Scene next to a geometry file, e.g. tank.sc2 for tank.scg
+def getScenePath(filepath):
+    basePath = os.path.splitext(stripDVPL(filepath))[0]
+    for scenePath in (basePath + ".sc2", basePath + ".sc2.dvpl"):
+        if os.path.isfile(scenePath):
+            return scenePath
+    return None
+
+# Materials come from the scene when there is one, the geometry is the same without.
+# The scene stays open whilst writing as its archives are read lazily.
+def writeBatchGLB(outputPath, polyGroups, filepath):
+    scenePath = getScenePath(filepath)
+    if scenePath is None:
+        writeGLB(outputPath, polyGroups)
+        return
+
+    try:
+        # Own buffer, the groups may still be backed by dvplBuffer
+        scene = SC2File(scenePath)
+    except Exception as error:
+        print(f"Warning: couldn't read materials from {scenePath}: {error}")
+        writeGLB(outputPath, polyGroups)
+        return
+
+    with scene:
+        try:
+            materials = scene.getPolygonGroupMaterials()
+        except Exception as error:
+            print(f"Warning: couldn't read materials from {scenePath}: {error}")
+            materials = None
+        writeGLB(outputPath, polyGroups, materials)
+
+WRITERS = {
+    "npz": (".npz", writeNPZ),
+    "glb": (".glb", writeBatchGLB)
+}
+
+'''
+Conversion
+'''
+# Decompression target shared by every file a worker process converts
+dvplBuffer = DVPLBuffer()
+
+def findSCGFiles(directory):
+    filepaths = []
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.endswith(".scg") or filename.endswith(".scg.dvpl"):
+                filepaths.append(os.path.join(root, filename))
+
+    return sorted(filepaths)
+
+# Runs in a worker process, failures are reported in the result
+# so that one broken file doesn't take the whole batch down
+def convertSCG(filepath, outputPath, outputFormat, cacheDirectory=None):
+    result = BatchResult(filepath, outputPath)
+    start = perf_counter()
+    try:
+        result.size = os.path.getsize(filepath)
+        if cacheDirectory is not None:
+            nodes = DecodeCache(cacheDirectory).readSCG(filepath)
+        else:
+            with SCGFile(filepath, dvplBuffer) as scg:
+                nodes = {groupID: scg[groupID] for groupID in scg}
+
+        polyGroups = {}
+        for groupID in nodes:
+            polyGroups[groupID] = PolygonGroup( nodes[groupID] )
+            result.vertexCount += len(polyGroups[groupID].vertexData)
+        result.groupCount = len(polyGroups)
+
+        os.makedirs(os.path.dirname(outputPath), exist_ok=True)
+        _, writer = WRITERS[outputFormat]
+        writer(outputPath, polyGroups, filepath)
+    except Exception as error:
+        result.error = f"{type(error).__name__}: {error}"
+    result.time = perf_counter() - start
+
+    return result
+
+# Stores every group of a file that isn't in the store yet and writes a
+# manifest referencing them to outputPath, shared groups are never decoded
+def storeSCG(filepath, outputPath, storeDirectory):
+    result = BatchResult(filepath, outputPath)
+    start = perf_counter()
+    try:
+        result.size = os.path.getsize(filepath)
+        store = GeometryStore(storeDirectory)
+        groupHashes = {}
+        with SCGFile(filepath, dvplBuffer) as scg:
+            for groupID in scg:
+                node = scg[groupID]
+                contentHash = groupHashes[groupID] = getContentHash(node)
+                if store.store(contentHash, node):
+                    result.vertexCount += scg.entries[groupID].vertexCount
+                else:
+                    result.sharedCount += 1
+            result.groupCount = len(scg)
+
+        os.makedirs(os.path.dirname(outputPath), exist_ok=True)
+        store.writeManifest(outputPath, filepath, groupHashes)
+    except Exception as error:
+        result.error = f"{type(error).__name__}: {error}"
+    result.time = perf_counter() - start
+
+    return result
+
+# With a storeDirectory groups go into a GeometryStore and every file gets a .json manifest instead
+def batchConvert(inputDirectory, outputDirectory, outputFormat="npz", jobs=None, cacheDirectory=None, progress=print, storeDirectory=None):
+    extension = ".json" if storeDirectory is not None else WRITERS[outputFormat][0]
+    filepaths = findSCGFiles(inputDirectory)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for filepath in filepaths:
+            relativePath = os.path.relpath(filepath, inputDirectory)
+            outputPath = os.path.join(outputDirectory, os.path.splitext(stripDVPL(relativePath))[0] + extension)
+            if storeDirectory is not None:
+                future = pool.submit(storeSCG, filepath, outputPath, storeDirectory)
+            else:
+                future = pool.submit(convertSCG, filepath, outputPath, outputFormat, cacheDirectory)
+            futures[future] = (filepath, outputPath)
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                # The worker itself died (e.g. ran out of memory)
+                result = BatchResult(*futures[future])
+                result.error = f"{type(error).__name__}: {error}"
+            results.append(result)
+
+            if progress is not None:
+                status = f"failed, {result.error}" if result.error else f"{result.groupCount} groups, {result.time:.3f}s"
+                progress(f"[{len(results)}/{len(filepaths)}] {os.path.relpath(result.filepath, inputDirectory)}: {status}")
+
+    return results
+
+'''
+CLI
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert every .scg and .scg.dvpl file in a directory tree")
+    parser.add_argument("input", help="Directory to search for .scg and .scg.dvpl files, e.g. packs/3d")
+    parser.add_argument("output", help="Directory to write converted files to, the input tree is mirrored")
+    parser.add_argument("--format", choices=WRITERS.keys(), default="npz", help="Output format")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker process count, defaults to the CPU count")
+    parser.add_argument("--cache", default=None, metavar="DIRECTORY", help="Reuse decoded geometry from this cache directory")
+    parser.add_argument("--store", default=None, metavar="DIRECTORY", help="Store each distinct polygon group once in this directory and write a manifest per file instead of converting")
+    args = parser.parse_args(argv)
+
+    start = perf_counter()
+    results = batchConvert(args.input, args.output, args.format, args.jobs, args.cache, storeDirectory=args.store)
+    elapsed = perf_counter() - start
+
+    failures = [result for result in results if result.error]
+    size = sum(result.size for result in results)
+    vertexCount = sum(result.vertexCount for result in results)
+    print(f"Converted {len(results) - len(failures)}/{len(results)} files in {elapsed:.2f}s")
+    if elapsed > 0:
+        print(f"{size / elapsed / 1e6:.1f} MB/s, {vertexCount / elapsed:.0f} vertices/s")
+    if args.store is not None:
+        groupCount = sum(result.groupCount for result in results)
+        sharedCount = sum(result.sharedCount for result in results)
+        print(f"{groupCount - sharedCount}/{groupCount} polygon groups were new to the store")
+    for result in failures:
+        print(f"Failed: {result.filepath}: {result.error}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
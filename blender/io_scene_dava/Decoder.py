@@ -0,0 +1,116 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+from queue import Queue, Full
+import threading
+import os
+
+from .FileIO.SCG import SCGFile
+from .FileIO.Cache import DecodeCache
+from .Geometry.PolygonGroup import PolygonGroup, PrimitiveTypes
+from .Geometry.Weld import weldVertices
+
+'''
+Decoding
+
+Everything up to Blender mesh creation, none of it touches bpy so it can run off the main thread
+'''
+def readNodes(filepath, useCache, profiler):
+    if useCache:
+        with profiler.stage("read", size=os.path.getsize(filepath)):
+            return DecodeCache().readSCG(filepath)
+
+    nodes = {}
+    with profiler.stage("read", size=os.path.getsize(filepath)):
+        scg = SCGFile(filepath)
+    with scg:
+        for groupID in scg:
+            with profiler.stage("parse", groupID, scg.entries[groupID].length):
+                nodes[groupID] = scg[groupID]
+
+    return nodes
+
+class DecodedGroup:
+    def __init__(self, groupID, group, weld, faces):
+        self.id = groupID
+        self.group = group
+        # WeldResult or None
+        self.weld = weld
+        # Triangles for buildMesh, None for line lists
+        self.faces = faces
+
+def decodeGroup(groupID, node, weld, profiler):
+    with profiler.stage("decode", groupID, len(node["vertices"]) + len(node["indices"])):
+        group = PolygonGroup(node)
+
+    weldResult = None
+    if weld:
+        with profiler.stage("weld", groupID, group.vertexData.nbytes):
+            weldResult = weldVertices(group)
+
+    faces = None
+    if group.primitiveType != PrimitiveTypes.LINELIST:
+        with profiler.stage("primitives", groupID, group.indices.nbytes):
+            if group.primitiveType == PrimitiveTypes.TRIANGLESTRIP:
+                faces = group.getTriangleStrip()
+            else:
+                faces = group.getTriangleList()
+
+    return DecodedGroup(groupID, group, weldResult, faces)
+
+'''
+Background decoding
+'''
+# Decodes a file on a worker thread, decoded groups are handed over through
+# results followed by None once everything is done. Errors are put in the
+# queue as they are. The queue is bounded so decoding can't run too far
+# ahead of mesh creation.
+class BackgroundDecoder:
+    QUEUE_SIZE = 64
+
+    def __init__(self, filepath, useCache, weld, profiler):
+        self.filepath = filepath
+        self.useCache = useCache
+        self.weld = weld
+        self.profiler = profiler
+
+        self.results = Queue(self.QUEUE_SIZE)
+        self.cancelled = threading.Event()
+        # Known once the file has been read
+        self.groupCount = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    # Waits for space in the queue, gives up once cancelled
+    def put(self, result):
+        while not self.cancelled.is_set():
+            try:
+                self.results.put(result, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def run(self):
+        try:
+            nodes = readNodes(self.filepath, self.useCache, self.profiler)
+            self.groupCount = len(nodes)
+            for groupID, node in nodes.items():
+                if not self.put(decodeGroup(groupID, node, self.weld, self.profiler)):
+                    return
+        except Exception as error:
+            self.put(error)
+            return
+        self.put(None)
@@ -0,0 +1,214 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+from .SCG import SCGFile
+from .StreamBuffer import MemoryBuffer
+from ..Geometry.PolygonGroup import PolygonGroup, PrimitiveTypes
+from ..Geometry.BVH import BVH
+
+from hashlib import blake2b
+import tempfile
+import json
+import mmap
+import os
+
+import numpy as np
+
+'''
+Errors
+'''
+class CacheReadError(RuntimeError): pass
+class CacheWriteError(RuntimeError): pass
+
+'''
+Cache file
+
+struct CacheFile {
+  char magic[4]; // "DVCC"
+  uint32 headerLength;
+  char header[headerLength]; // JSON, one object per polygon group
+  byte blobs[]; // 16 byte aligned, located by the header
+}
+'''
+CACHE_MAGIC = b"DVCC"
+CACHE_VERSION = 1
+BLOB_ALIGNMENT = 16
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), "io_scene_dava_cache")
+
+# Node values can be bytes-like (arrays included), which become blobs, or
+# JSON scalars. Anything else (nested archives, lists, vectors) raises a
+# CacheWriteError rather than be left out of the entry.
+# With exclusive an existing file is left alone and False is returned, of
+# several processes writing the same file exactly one gets True
+def writeCacheFile(filepath, nodes, exclusive=False):
+    header = []
+    blobs = []
+    offset = 0
+    for groupID, node in nodes.items():
+        values = {}
+        blobLocations = {}
+        for key, value in node.items():
+            if isinstance(value, np.ndarray):
+                value = memoryview(np.ascontiguousarray(value).reshape(-1)).cast("B")
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                length = memoryview(value).nbytes
+                blobLocations[key] = (offset, length)
+                blobs.append(value)
+                padding = -length % BLOB_ALIGNMENT
+                blobs.append(bytes(padding))
+                offset += length + padding
+            elif isinstance(value, (bool, int, float, str, np.bool_, np.integer, np.floating)) or value is None:
+                values[key] = value.item() if isinstance(value, np.generic) else value
+            else:
+                raise CacheWriteError(f"Can't cache {key} of group {groupID}: {type(value).__name__} values aren't supported")
+        header.append({"id": groupID, "values": values, "blobs": blobLocations})
+
+    header = json.dumps(header).encode("utf-8")
+    header += b" " * (-(len(header) + 8) % BLOB_ALIGNMENT)
+
+    # Write next to the final file and swap it in so readers never see a partial entry
+    temporaryPath = f"{filepath}.{os.getpid()}.tmp"
+    with open(temporaryPath, "wb") as file:
+        file.write(CACHE_MAGIC)
+        file.write(len(header).to_bytes(4, "little"))
+        file.write(header)
+        for blob in blobs:
+            file.write(blob)
+
+    if not exclusive:
+        os.replace(temporaryPath, filepath)
+        return True
+
+    # Linking fails when the file exists, unlike replacing
+    try:
+        os.link(temporaryPath, filepath)
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(temporaryPath)
+    return True
+
+# Blobs of the returned nodes are views into a memory map of the cache file
+def readCacheFile(filepath):
+    with open(filepath, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    stream = MemoryBuffer(data)
+    if stream.readBytes(4) != CACHE_MAGIC:
+        raise CacheReadError("Invalid magic string")
+    headerLength = stream.readInt32(False)
+    header = json.loads(stream.readString(headerLength))
+    blobStart = stream.tell()
+
+    nodes = {}
+    for group in header:
+        node = dict(group["values"])
+        for key, (offset, length) in group["blobs"].items():
+            stream.seek(blobStart + offset, 0)
+            node[key] = stream.readBytes(length)
+        nodes[group["id"]] = node
+
+    return nodes
+
+'''
+Decode cache
+'''
+# Opt-in on-disk cache of decoded SCG polygon groups, entries are keyed
+# by the source file and evicted least recently used first once the
+# cache grows past maxSize bytes
+class DecodeCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, maxSize=1 << 30, hashContents=False):
+        self.directory = directory
+        self.maxSize = maxSize
+        self.hashContents = hashContents
+        os.makedirs(directory, exist_ok=True)
+
+    # Path, size and modification time identify the source, hashContents
+    # also hashes the file so that touched but unchanged files still hit
+    def getKey(self, filepath):
+        stat = os.stat(filepath)
+        key = blake2b(digest_size=16)
+        key.update(f"{CACHE_VERSION}|{os.path.abspath(filepath)}|{stat.st_size}".encode("utf-8"))
+        if self.hashContents:
+            with open(filepath, "rb") as file:
+                while chunk := file.read(1 << 20):
+                    key.update(chunk)
+        else:
+            key.update(f"|{stat.st_mtime_ns}".encode("utf-8"))
+
+        return key.hexdigest()
+
+    # Entries other than the decoded groups (e.g. BVHs) get their own suffix
+    def getEntryPath(self, filepath, suffix=""):
+        return os.path.join(self.directory, f"{self.getKey(filepath)}{suffix}.dvcc")
+
+    def load(self, filepath, suffix=""):
+        entryPath = self.getEntryPath(filepath, suffix)
+        if not os.path.exists(entryPath):
+            return None
+
+        try:
+            nodes = readCacheFile(entryPath)
+        except (CacheReadError, ValueError, OSError) as error:
+            print(f"Warning: discarding broken cache entry {entryPath}: {error}")
+            os.remove(entryPath)
+            return None
+        os.utime(entryPath) # Mark as recently used
+
+        return nodes
+
+    def store(self, filepath, nodes, suffix=""):
+        writeCacheFile(self.getEntryPath(filepath, suffix), nodes)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".dvcc"):
+                continue
+            path = os.path.join(self.directory, filename)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        totalSize = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if totalSize <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue # Still mapped by another process
+            totalSize -= size
+
+    # Polygon group archives of an SCG file by id, from the cache if possible
+    def readSCG(self, filepath):
+        nodes = self.load(filepath)
+        if nodes is not None:
+            return nodes
+
+        with SCGFile(filepath) as scg:
+            nodes = {groupID: scg[groupID] for groupID in scg}
+        self.store(filepath, nodes)
+
+        return nodes
+
+    # BVH of every triangle polygon group of an SCG file by id, from the cache if possible
+    def readBVHs(self, filepath):
+        nodes = self.load(filepath, ".bvh")
+        if nodes is None:
+            nodes = {}
+            for groupID, node in self.readSCG(filepath).items():
+                group = PolygonGroup(node)
+                if group.primitiveType != PrimitiveTypes.LINELIST:
+                    nodes[groupID] = BVH.fromPolygonGroup(group).toNode()
+            self.store(filepath, nodes, ".bvh")
+
+        return {groupID: BVH.fromNode(node) for groupID, node in nodes.items()}
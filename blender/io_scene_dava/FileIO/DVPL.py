@@ -0,0 +1,202 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+from struct import Struct
+import mmap
+import zlib
+
+try:
+    import lz4.block
+except ImportError:
+    lz4 = None
+
+'''
+Errors
+'''
+class DVPLReadError(RuntimeError): pass
+
+'''
+DVPL container
+
+struct DVPLFile {
+  byte data[compressedSize];
+  struct Footer {
+    uint32 originalSize;
+    uint32 compressedSize;
+    uint32 crc32; // Of data
+    uint32 type;
+    char magic[4]; // "DVPL"
+  } footer;
+}
+'''
+class CompressionTypes:
+    NONE = 0
+    LZ4 = 1
+    LZ4_HC = 2
+    RFC1951 = 3
+
+DVPL_EXTENSION = ".dvpl"
+FooterStruct = Struct("<4I4s")
+
+def readDVPLFooter(data):
+    if len(data) < FooterStruct.size:
+        raise DVPLReadError("File is too short for a DVPL footer")
+
+    originalSize, compressedSize, crc, compressionType, magic = FooterStruct.unpack_from(data, len(data) - FooterStruct.size)
+    if magic != b"DVPL":
+        raise DVPLReadError("Invalid magic string")
+    if compressedSize != len(data) - FooterStruct.size:
+        raise DVPLReadError(f"Compressed size mismatch: footer says {compressedSize} but the file holds {len(data) - FooterStruct.size}")
+
+    return (originalSize, compressedSize, crc, compressionType)
+
+'''
+LZ4
+'''
+# LZ4 block format decoder for when the lz4 package isn't installed, decodes
+# straight into destination (a writable buffer of the original size)
+def decompressLZ4Block(source, destination):
+    sourceSize = len(source)
+    inputPosition = 0
+    outputPosition = 0
+    try:
+        while inputPosition < sourceSize:
+            token = source[inputPosition]
+            inputPosition += 1
+
+            # Literals
+            literalLength = token >> 4
+            if literalLength == 15:
+                while True:
+                    extra = source[inputPosition]
+                    inputPosition += 1
+                    literalLength += extra
+                    if extra != 255:
+                        break
+            destination[outputPosition:outputPosition + literalLength] = source[inputPosition:inputPosition + literalLength]
+            inputPosition += literalLength
+            outputPosition += literalLength
+            # The last sequence only has literals
+            if inputPosition >= sourceSize:
+                break
+
+            # Match
+            offset = source[inputPosition] | (source[inputPosition + 1] << 8)
+            inputPosition += 2
+            if offset == 0 or offset > outputPosition:
+                raise DVPLReadError(f"Invalid LZ4 match offset {offset}")
+            matchLength = token & 15
+            if matchLength == 15:
+                while True:
+                    extra = source[inputPosition]
+                    inputPosition += 1
+                    matchLength += extra
+                    if extra != 255:
+                        break
+            matchLength += 4
+
+            matchStart = outputPosition - offset
+            if offset >= matchLength:
+                destination[outputPosition:outputPosition + matchLength] = destination[matchStart:matchStart + matchLength]
+            else:
+                # The match overlaps the output, it repeats the last offset bytes
+                pattern = bytes(destination[matchStart:outputPosition])
+                destination[outputPosition:outputPosition + matchLength] = (pattern * (matchLength // offset + 1))[:matchLength]
+            outputPosition += matchLength
+    except (IndexError, ValueError) as error:
+        # Reads past the end of the input or writes past the end of the output
+        raise DVPLReadError(f"Corrupt LZ4 block: {error}")
+
+    return outputPosition
+
+'''
+Decompression
+'''
+# Reusable decompression target, a new buffer is only allocated when a
+# file doesn't fit or views from an earlier call (or arrays made from them)
+# are still alive, so those are never overwritten.
+class DVPLBuffer:
+    def __init__(self, size=0):
+        self.buffer = bytearray(size)
+
+    # bytearrays can't be resized whilst anything is viewing them
+    def isExported(self):
+        try:
+            self.buffer.append(0)
+        except BufferError:
+            return True
+        self.buffer.pop()
+        return False
+
+    def getView(self, size):
+        if len(self.buffer) < size or self.isExported():
+            self.buffer = bytearray(size)
+        return memoryview(self.buffer)[:size]
+
+    # Decompressed contents of a whole DVPL file as a memoryview
+    def decompress(self, data):
+        originalSize, compressedSize, crc, compressionType = readDVPLFooter(data)
+        compressed = memoryview(data)[:compressedSize]
+        if zlib.crc32(compressed) != crc:
+            raise DVPLReadError("CRC mismatch")
+
+        match compressionType:
+            case CompressionTypes.NONE:
+                decompressed = compressed
+            case CompressionTypes.LZ4 | CompressionTypes.LZ4_HC:
+                if lz4 is not None:
+                    decompressed = memoryview(lz4.block.decompress(compressed, uncompressed_size=originalSize))
+                else:
+                    decompressed = self.getView(originalSize)
+                    decompressed = decompressed[:decompressLZ4Block(compressed, decompressed)]
+            case CompressionTypes.RFC1951:
+                decompressed = memoryview(zlib.decompress(compressed, -15))
+            case _:
+                raise DVPLReadError(f"Unknown compression type {compressionType}")
+
+        if len(decompressed) != originalSize:
+            raise DVPLReadError(f"Size mismatch: expected {originalSize} bytes but got {len(decompressed)}")
+
+        return decompressed
+
+def isDVPL(filepath):
+    return filepath.lower().endswith(DVPL_EXTENSION)
+
+# Path of a file with any .dvpl extension removed, e.g. for output names
+def stripDVPL(filepath):
+    return filepath[:-len(DVPL_EXTENSION)] if isDVPL(filepath) else filepath
+
+# Whole file as a read only memoryview without copying: .dvpl files are
+# decompressed in memory, everything else is memory mapped. Returns the
+# owner of the memory (an mmap or buffer) along with the view.
+def mapFile(filepath, buffer=None):
+    with open(filepath, "rb") as file:
+        fileMap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if not isDVPL(filepath):
+        return (fileMap, memoryview(fileMap))
+
+    try:
+        view = (buffer or DVPLBuffer()).decompress(fileMap)
+    except DVPLReadError:
+        try:
+            fileMap.close()
+        except BufferError:
+            pass
+        raise
+
+    # Uncompressed contents are still a view of the map
+    if view.obj is fileMap:
+        return (fileMap, view.toreadonly())
+    fileMap.close()
+    return (view.obj, view.toreadonly())
+
+def readDVPL(filepath, buffer=None):
+    _, view = mapFile(filepath, buffer)
+    return view
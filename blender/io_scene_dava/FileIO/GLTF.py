@@ -0,0 +1,245 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+from ..Geometry.PolygonGroup import VertexAttributes, IndexTypes, PrimitiveTypes
+
+from collections.abc import Mapping
+from struct import Struct
+import json
+
+import numpy as np
+
+'''
+Errors
+'''
+class GLTFWriteError(RuntimeError): pass
+
+'''
+glTF constants
+'''
+class ComponentTypes:
+    UNSIGNED_BYTE = 5121
+    UNSIGNED_SHORT = 5123
+    UNSIGNED_INT = 5125
+    FLOAT = 5126
+
+class BufferTargets:
+    ARRAY_BUFFER = 34962
+    ELEMENT_ARRAY_BUFFER = 34963
+
+PrimitiveModes = {
+    PrimitiveTypes.TRIANGLELIST: 4,
+    PrimitiveTypes.TRIANGLESTRIP: 5,
+    PrimitiveTypes.LINELIST: 1
+}
+
+AccessorTypes = {
+    1: "SCALAR",
+    2: "VEC2",
+    3: "VEC3",
+    4: "VEC4"
+}
+
+IndexComponentTypes = {
+    IndexTypes.UINT16: ComponentTypes.UNSIGNED_SHORT,
+    IndexTypes.UINT32: ComponentTypes.UNSIGNED_INT
+}
+
+# glTF names of the attributes that have a standard meaning, the rest are
+# written as application specific attributes (e.g. "_FLEXIBILITY").
+# glTF tangents are VEC4, so DAVA's are custom too. Joints and weights are
+# only standard as a pair, see buildGLTF.
+StandardAttributes = {
+    "VERTEX": "POSITION",
+    "NORMAL": "NORMAL",
+    "COLOR": "COLOR_0",
+    "TEXCOORD0": "TEXCOORD_0",
+    "TEXCOORD1": "TEXCOORD_1",
+    "TEXCOORD2": "TEXCOORD_2",
+    "TEXCOORD3": "TEXCOORD_3"
+}
+
+'''
+GLB
+
+struct GLB {
+  uint32 magic; // "glTF"
+  uint32 version; // 2
+  uint32 length;
+  struct Chunk {
+    uint32 length;
+    uint32 type; // "JSON" then "BIN\0"
+    byte data[length]; // 4 byte aligned
+  } chunks[2];
+}
+'''
+GLBHeaderStruct = Struct("<4sII")
+ChunkHeaderStruct = Struct("<I4s")
+
+def getPadding(length):
+    return -length % 4
+
+# Material of a polygon group from an SC2 NMaterial archive, the textures
+# are DAVA resource paths so they are only kept in extras
+def buildMaterial(material):
+    gltfMaterial = {"name": str(material.get("materialName", "material"))}
+    extras = {}
+    if "fxName" in material:
+        extras["fxName"] = str(material["fxName"])
+    textures = material.get("textures")
+    if isinstance(textures, Mapping):
+        extras["textures"] = {str(slot): str(path) for slot, path in textures.items() if isinstance(path, str)}
+    if extras:
+        gltfMaterial["extras"] = extras
+
+    return gltfMaterial
+
+# DAVA is Z up and glTF Y up, every group hangs off a root node turned -90 degrees around X
+ROOT_ROTATION = [-0.7071068, 0.0, 0.0, 0.7071068]
+
+# glTF document for the groups and the blobs making up its binary buffer.
+# Every group's interleaved vertex buffer and index buffer go in as they
+# are: the vertex buffer becomes a bufferView with the vertex stride and
+# every attribute an accessor at its VertexFormat offset.
+def buildGLTF(polyGroups, materials=None):
+    document = {
+        "asset": {"version": "2.0", "generator": "io_scene_dava"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"name": "DAVA", "rotation": ROOT_ROTATION, "children": []}],
+        "meshes": [],
+        "accessors": [],
+        "bufferViews": [],
+        "buffers": []
+    }
+    blobs = []
+    offset = 0
+    materialIndices = {}
+
+    def addBufferView(blob, target, byteStride=None):
+        nonlocal offset
+        length = memoryview(blob).nbytes
+        bufferView = {"buffer": 0, "byteOffset": offset, "byteLength": length, "target": target}
+        if byteStride is not None:
+            bufferView["byteStride"] = byteStride
+        document["bufferViews"].append(bufferView)
+
+        blobs.append(blob)
+        offset += length
+        padding = getPadding(length)
+        if padding:
+            blobs.append(bytes(padding))
+            offset += padding
+
+        return len(document["bufferViews"]) - 1
+
+    def addAccessor(accessor):
+        document["accessors"].append(accessor)
+        return len(document["accessors"]) - 1
+
+    for groupID, group in polyGroups.items():
+        vertexCount = len(group.vertexData)
+        if vertexCount == 0 or len(group.indices) == 0:
+            continue
+        vertexFormat = group.vertexFormat
+
+        vertexView = addBufferView(group.vertexData, BufferTargets.ARRAY_BUFFER, vertexFormat.stride)
+        # glTF joints are integers, DAVA's floats are repacked into their own buffer view
+        skinned = vertexFormat.JOINTINDEX != -1 and vertexFormat.JOINTWEIGHT != -1
+        attributes = {}
+        for attribute, componentType, componentCount in VertexAttributes:
+            attributeOffset = getattr(vertexFormat, attribute)
+            if attributeOffset == -1 or (skinned and attribute == "JOINTINDEX"):
+                continue
+
+            accessor = {
+                "bufferView": vertexView,
+                "byteOffset": attributeOffset,
+                "count": vertexCount,
+                "type": AccessorTypes[componentCount]
+            }
+            if componentType == "u1":
+                accessor["componentType"] = ComponentTypes.UNSIGNED_BYTE
+                accessor["normalized"] = True
+            else:
+                accessor["componentType"] = ComponentTypes.FLOAT
+            if attribute == "VERTEX":
+                # Positions need bounds, they were worked out when the group was parsed
+                accessor["min"] = [float(value) for value in group.bounds[0]]
+                accessor["max"] = [float(value) for value in group.bounds[1]]
+            if skinned and attribute == "JOINTWEIGHT":
+                attributes["WEIGHTS_0"] = addAccessor(accessor)
+            else:
+                attributes[StandardAttributes.get(attribute, f"_{attribute}")] = addAccessor(accessor)
+
+        if skinned:
+            joints = np.rint(group.jointindices).astype(np.int64)
+            if joints.min() < 0 or joints.max() > 0xFFFF:
+                raise GLTFWriteError(f"Joint indices of polygon group {groupID} don't fit 16 bits")
+            jointType = np.uint8 if joints.max() <= 0xFF else np.uint16
+            attributes["JOINTS_0"] = addAccessor({
+                "bufferView": addBufferView(
+                    np.ascontiguousarray(joints, dtype=jointType), BufferTargets.ARRAY_BUFFER
+                ),
+                "componentType": ComponentTypes.UNSIGNED_BYTE if jointType == np.uint8 else ComponentTypes.UNSIGNED_SHORT,
+                "count": vertexCount,
+                "type": "VEC4"
+            })
+
+        indexView = addBufferView(group.indices, BufferTargets.ELEMENT_ARRAY_BUFFER)
+        primitive = {
+            "attributes": attributes,
+            "indices": addAccessor({
+                "bufferView": indexView,
+                "componentType": IndexComponentTypes[group.indexFormat],
+                "count": len(group.indices),
+                "type": "SCALAR"
+            }),
+            "mode": PrimitiveModes[group.primitiveType]
+        }
+
+        material = None if materials is None else materials.get(groupID)
+        if material is not None:
+            if id(material) not in materialIndices:
+                materialIndices[id(material)] = len(document.setdefault("materials", []))
+                document["materials"].append(buildMaterial(material))
+            primitive["material"] = materialIndices[id(material)]
+
+        document["meshes"].append({"name": f"PolygonGroup{groupID}", "primitives": [primitive]})
+        document["nodes"].append({"name": f"PolygonGroup{groupID}", "mesh": len(document["meshes"]) - 1})
+        document["nodes"][0]["children"].append(len(document["nodes"]) - 1)
+
+    # glTF arrays and buffers can't be empty, they're left out when every group was skipped
+    if offset:
+        document["buffers"].append({"byteLength": offset})
+    else:
+        del document["meshes"], document["bufferViews"], document["accessors"], document["buffers"]
+        del document["nodes"][0]["children"]
+    return (document, blobs)
+
+# Blobs are written straight from the polygon groups' buffers, only joint indices are copied
+def writeGLB(filepath, polyGroups, materials=None):
+    document, blobs = buildGLTF(polyGroups, materials)
+    documentJSON = json.dumps(document, separators=(",", ":")).encode("utf-8")
+    documentJSON += b" " * getPadding(len(documentJSON))
+    length = GLBHeaderStruct.size + ChunkHeaderStruct.size + len(documentJSON)
+    binaryLength = document["buffers"][0]["byteLength"] if "buffers" in document else 0
+    if binaryLength:
+        length += ChunkHeaderStruct.size + binaryLength
+
+    with open(filepath, "wb") as file:
+        file.write(GLBHeaderStruct.pack(b"glTF", 2, length))
+        file.write(ChunkHeaderStruct.pack(len(documentJSON), b"JSON"))
+        file.write(documentJSON)
+        # The BIN chunk is left out along with an empty buffer
+        if binaryLength:
+            file.write(ChunkHeaderStruct.pack(binaryLength, b"BIN\0"))
+            for blob in blobs:
+                file.write(blob)
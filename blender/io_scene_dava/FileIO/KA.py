@@ -10,7 +10,12 @@ THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR I
 
 from .StreamBuffer import StreamBuffer
 
-from io import BytesIO
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from struct import Struct, error as StructError
+import sys
+
+import numpy as np
 
 '''
 Errors
@@ -49,21 +54,143 @@ class Types:
     INT16 = 24
     UINT16 = 25
     ARRAY = 27
+    TRANSFORM = 29
+
+'''
+Archive versions
+'''
+class Versions:
+    V1 = 0x0001
+    V2 = 0x0002
+    V258 = 0x0102 # Nested in a version 2 archive, uses its string table
+    EMPTY = 0xff02
+
+# Size in bytes of the values that don't carry their own length
+FixedTypeSizes = {
+    Types.NONE: 0,
+    Types.BOOLEAN: 1,
+    Types.INT32: 4,
+    Types.FLOAT: 4,
+    Types.UINT32: 4,
+    Types.INT64: 8,
+    Types.UINT64: 8,
+    Types.VECTOR2: 2 * 4,
+    Types.VECTOR3: 3 * 4,
+    Types.VECTOR4: 4 * 4,
+    Types.MATRIX2: 2 * 2 * 4,
+    Types.MATRIX3: 3 * 3 * 4,
+    Types.MATRIX4: 4 * 4 * 4,
+    Types.COLOR: 4 * 4,
+    Types.AABBOX3: 2 * 3 * 4,
+    Types.FLOAT64: 8,
+    Types.INT8: 1,
+    Types.UINT8: 1,
+    Types.INT16: 2,
+    Types.UINT16: 2,
+    Types.TRANSFORM: 10 * 4
+}
+
+'''
+Archive
+'''
+# Archives with the same keys share one key to index table. Only the most
+# recently used layouts are kept, archives hold on to their own table so an
+# evicted one just stops being shared with new archives.
+KEY_INDEX_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=KEY_INDEX_CACHE_SIZE)
+def getKeyIndex(keys):
+    return {key: i for i, key in enumerate(keys)}
+
+# Value types a value can't be told apart from another of by its python type,
+# e.g. a UINT8 reads as a plain int. Readers keep these next to the values
+# so writers can write them back as they were.
+ImplicitTypes = frozenset((
+    Types.WIDE_STRING, Types.UINT32, Types.INT64, Types.UINT64, Types.COLOR, Types.FASTNAME,
+    Types.FILEPATH, Types.FLOAT64, Types.INT8, Types.UINT8, Types.INT16, Types.UINT16
+))
+
+# Type of every value as read, or None when nothing has an implicit type
+def getValueTypes(valueTypes):
+    valueTypes = tuple(valueType if valueType in ImplicitTypes else None for valueType in valueTypes)
+    return valueTypes if any(valueTypes) else None
+
+# Compact dict-like archive node, values are kept in a list next to a
+# key table shared by every archive with the same layout. valueTypes has
+# the type each value was read as (None for the ones types are inferred for).
+class KeyedArchive(Mapping):
+    __slots__ = ("keyIndex", "values", "valueTypes")
+
+    def __init__(self, keys=(), values=(), valueTypes=None):
+        keys = tuple(keys)
+        values = list(values)
+        if len(set(keys)) != len(keys):
+            # Duplicate keys, the last one wins like it would in a dict
+            merged = dict(zip(keys, zip(values, valueTypes or [None] * len(values))))
+            keys = tuple(merged.keys())
+            values = [value for value, _ in merged.values()]
+            valueTypes = valueTypes and [valueType for _, valueType in merged.values()]
+
+        self.keyIndex = getKeyIndex(keys)
+        self.values = values
+        self.valueTypes = None if valueTypes is None else getValueTypes(valueTypes)
+
+    # Type the value was read as, None if there's nothing to keep
+    def getValueType(self, key):
+        if self.valueTypes is None:
+            return None
+        return self.valueTypes[ self.keyIndex[key] ]
+
+    def __getitem__(self, key):
+        return self.values[ self.keyIndex[key] ]
+
+    def __setitem__(self, key, value):
+        if key in self.keyIndex:
+            self.values[ self.keyIndex[key] ] = value
+        else:
+            self.keyIndex = getKeyIndex( tuple(self.keyIndex) + (key,) )
+            self.values.append(value)
+            if self.valueTypes is not None:
+                self.valueTypes += (None,)
+
+    def __contains__(self, key):
+        return key in self.keyIndex
+
+    def __iter__(self):
+        return iter(self.keyIndex)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f"KeyedArchive({dict(self)})"
+
+# ARRAY value, a list that keeps the types its members were read as like KeyedArchive
+class KAArray(list):
+    __slots__ = ("valueTypes",)
+
+    def __init__(self, values=(), valueTypes=None):
+        super().__init__(values)
+        self.valueTypes = None if valueTypes is None else getValueTypes(valueTypes)
 
 '''
 Primitive data readers
 '''
+# Float vectors and matrices are read in one go as a typed array
+def readFloatArray(stream, count):
+    return np.frombuffer(stream.readBytes(4 * count), dtype="<f4")
+
 class V1DataReader:
+    # (key, value type, value)
     @classmethod
     def readPair(self, stream):
         key = self.readValue(
             stream, stream.readInt8(False)
         )
-        value = self.readValue(
-            stream, stream.readInt8(False)
-        )
+        valueType = stream.readInt8(False)
+        value = self.readValue(stream, valueType)
 
-        return (key, value)
+        return (key, valueType, value)
 
     @classmethod
     def readValue(self, stream, valueType):
@@ -87,55 +214,31 @@ class V1DataReader:
             case Types.UINT32:
                 return stream.readInt32(False)
             case Types.KEYED_ARCHIVE:
-                length = stream.readInt32(False)
-                buffer = BytesIO(stream.readBytes(length))
-                buffer = FileBuffer(buffer)
-                return readKA1(buffer)
+                return readNestedKA(stream)
             case Types.INT64:
                 return stream.readInt64()
             case Types.UINT64:
                 return stream.readInt64(False)
             case Types.VECTOR2:
-                return np.array([
-                    stream.readFloat(), stream.readFloat()
-                ])
+                return readFloatArray(stream, 2)
             case Types.VECTOR3:
-                return np.array([
-                    stream.readFloat(), stream.readFloat(), stream.readFloat()
-                ])
+                return readFloatArray(stream, 3)
             case Types.VECTOR4:
-                return np.array([
-                    stream.readFloat(), stream.readFloat(), stream.readFloat(), stream.readFloat()
-                ])
+                return readFloatArray(stream, 4)
             case Types.MATRIX2:
-                return np.matrix([
-                    [stream.readFloat(), stream.readFloat()],
-                    [stream.readFloat(), stream.readFloat()]
-                ])
+                return readFloatArray(stream, 4).reshape(2, 2)
             case Types.MATRIX3:
-                return np.matrix([
-                    [stream.readFloat(), stream.readFloat(), stream.readFloat()],
-                    [stream.readFloat(), stream.readFloat(), stream.readFloat()],
-                    [stream.readFloat(), stream.readFloat(), stream.readFloat()]
-                ])
+                return readFloatArray(stream, 9).reshape(3, 3)
             case Types.MATRIX4:
-                return np.matrix([
-                    [stream.readFloat(), stream.readFloat(), stream.readFloat(), stream.readFloat()],
-                    [stream.readFloat(), stream.readFloat(), stream.readFloat(), stream.readFloat()],
-                    [stream.readFloat(), stream.readFloat(), stream.readFloat(), stream.readFloat()],
-                    [stream.readFloat(), stream.readFloat(), stream.readFloat(), stream.readFloat()]
-                ])
+                return readFloatArray(stream, 16).reshape(4, 4)
             case Types.COLOR:
-                return np.array([
-                    stream.readFloat(), stream.readFloat(), stream.readFloat(), stream.readFloat() #RGBA
-                ])
+                return readFloatArray(stream, 4) #RGBA
             case Types.FASTNAME:
                 length = stream.readInt32(False)
                 return stream.readString(length)
             case Types.AABBOX3:
-                minimum = DataReader.readVector3(stream)
-                maximum = DataReader.readVector3(stream)
-                return AABBox3(minimum, maximum)
+                minimum, maximum = readFloatArray(stream, 6).reshape(2, 3)
+                return (minimum, maximum)
             case Types.FILEPATH:
                 length = stream.readInt32(False)
                 return stream.readString(length)
@@ -152,23 +255,50 @@ class V1DataReader:
             case Types.ARRAY:
                 length = stream.readInt32(False)
                 array = []
+                valueTypes = []
+                for _ in range(length):
+                    valueTypes.append(stream.readInt8(False))
+                    array.append(
+                        self.readValue(stream, valueTypes[-1])
+                    )
+                return KAArray(array, valueTypes)
+            case Types.TRANSFORM:
+                transform = readFloatArray(stream, 10)
+                return (transform[0:3], transform[3:6], transform[6:10]) # Position, scale, quaternion
+            case Types.NONE:
+                return None
+            case other:
+                raise KAReadError(f"Unknown data type id: {valueType}")
+
+    # Moves the stream past a value without decoding it
+    @classmethod
+    def skipValue(self, stream, valueType):
+        if valueType in FixedTypeSizes:
+            stream.seek(FixedTypeSizes[valueType], 1)
+            return
+
+        match valueType:
+            case Types.STRING | Types.WIDE_STRING | Types.BYTE_ARRAY | Types.KEYED_ARCHIVE | Types.FASTNAME | Types.FILEPATH:
+                length = stream.readInt32(False)
+                stream.seek(length, 1)
+            case Types.ARRAY:
+                length = stream.readInt32(False)
                 for _ in range(length):
-                    array.append(self.readValue(stream))
-                return array
+                    self.skipValue(stream, stream.readInt8(False))
             case other:
                 raise KAReadError(f"Unknown data type id: {valueType}")
 
 class V2DataReader:
+    # (key, value type, value)
     @classmethod
     def readPair(self, stream, stringTable):
         key = stringTable[
                 stream.readInt32(False)
         ]
-        value = self.readValue(
-                stream, stream.readInt8(False), stringTable
-        )
+        valueType = stream.readInt8(False)
+        value = self.readValue(stream, valueType, stringTable)
 
-        return (key, value)
+        return (key, valueType, value)
 
     @classmethod
     def readValue(self, stream, valueType, stringTable):
@@ -182,21 +312,32 @@ class V2DataReader:
             case Types.FILEPATH:
                 return stringTable[ stream.readInt32(False) ]
             case Types.KEYED_ARCHIVE:
-                length = stream.readInt32(False)
-                buffer = BytesIO(stream.readBytes(length))
-                buffer = FileBuffer(buffer)
-                return readKA258(buffer)
+                return readNestedKA(stream, stringTable)
             case Types.ARRAY:
                 length = stream.readInt32(False)
                 array = []
+                valueTypes = []
                 for _ in range(length):
+                    valueTypes.append(stream.readInt8(False))
                     array.append(
-                            self.readValue(stream, valueType, stringTable)
+                            self.readValue(stream, valueTypes[-1], stringTable)
                     )
-                return array
+                return KAArray(array, valueTypes)
             case other:
                 return V1DataReader.readValue(stream, valueType)
 
+    @classmethod
+    def skipValue(self, stream, valueType):
+        match valueType:
+            case Types.STRING | Types.WIDE_STRING | Types.FASTNAME | Types.FILEPATH:
+                stream.seek(4, 1)
+            case Types.ARRAY:
+                length = stream.readInt32(False)
+                for _ in range(length):
+                    self.skipValue(stream, stream.readInt8(False))
+            case other:
+                V1DataReader.skipValue(stream, valueType)
+
 '''
 KA Readers
 '''
@@ -205,74 +346,716 @@ def readKAHeader(stream):
         raise KAReadError("Invalid magic string")
 
     version = stream.readInt16(False)
+    if version == Versions.EMPTY:
+        return (version, 0)
     nodeCount = stream.readInt32(False)
 
     return (version, nodeCount)
 
-def readKA1(stream):
+def readKABody(stream, version, nodeCount, stringTable=None):
+    match version:
+        case Versions.V1:
+            keys = []
+            valueTypes = []
+            values = []
+            for _ in range(nodeCount):
+                key, valueType, value = V1DataReader.readPair(stream)
+                keys.append(key)
+                valueTypes.append(valueType)
+                values.append(value)
+            return KeyedArchive(keys, values, valueTypes)
+        case Versions.V2:
+            return readKA2Body(stream, nodeCount)
+        case Versions.V258:
+            if stringTable is None:
+                raise KAReadError("Version 258 archive outside of a version 2 archive")
+            keys = []
+            valueTypes = []
+            values = []
+            for _ in range(nodeCount):
+                key, valueType, value = V2DataReader.readPair(stream, stringTable)
+                keys.append(key)
+                valueTypes.append(valueType)
+                values.append(value)
+            return KeyedArchive(keys, values, valueTypes)
+        case Versions.EMPTY:
+            return KeyedArchive()
+        case other:
+            raise KAReadError(f"Unknown version: {version}")
+
+# Archive of any version, stringTable is needed for version 258 archives
+def readKA(stream, stringTable=None):
     version, nodeCount = readKAHeader(stream)
-    if version != 1:
-        raise KAReadError(f"Version mismatch: expected 1 but got {version}")
-    elif nodeCount == 0:
-        return {}
+    return readKABody(stream, version, nodeCount, stringTable)
 
-    archive = {}
-    for _ in range(nodeCount):
-        key, value = V1DataReader.readPair(stream)
-        archive[key] = value
+# Archive stored as a value, it is parsed in place and the stream
+# ends up after its declared length either way
+def readNestedKA(stream, stringTable=None):
+    length = stream.readInt32(False)
+    if length == 0:
+        return KeyedArchive()
+
+    end = stream.tell() + length
+    archive = readKA(stream, stringTable)
+    stream.seek(end, 0)
 
     return archive
 
-def readKA2(stream):
-    version, stringCount = readKAHeader(stream)
-    if version != 2:
-        raise KAReadError(f"Version mismatch: expected 2 but got {version}")
-    elif stringCount == 0:
-        return {}
+def readKA1(stream):
+    version, nodeCount = readKAHeader(stream)
+    if version != Versions.V1:
+        raise KAReadError(f"Version mismatch: expected 1 but got {version}")
+
+    return readKABody(stream, version, nodeCount)
 
+# Build the string table once, nested version 258 archives share it
+def readStringTable(stream, stringCount):
     strings = []
-    for _ in range(nodeCount):
+    for _ in range(stringCount):
         length = stream.readInt16(False)
         strings.append(
-            stream.readString(length)
+            sys.intern(stream.readString(length))
         )
 
-    stringTable = {}
-    for stringI in range(nodeCount):
-        key = stream.readInt32(False)
-        stringTable[key] = strings[stringI]
+    return dict(zip(
+        stream.readInt32s(stringCount, False), strings
+    ))
 
+def readKA2Body(stream, stringCount):
+    stringTable = readStringTable(stream, stringCount)
     archiveNodeCount = stream.readInt32(False)
 
-    archive = {}
+    keys = []
+    valueTypes = []
+    values = []
     for _ in range(archiveNodeCount):
-        key, value = V2DataReader.readPair(stream, stringTable)
-        archive[key] = value
+        key, valueType, value = V2DataReader.readPair(stream, stringTable)
+        keys.append(key)
+        valueTypes.append(valueType)
+        values.append(value)
 
-    return archive
-    
+    return KeyedArchive(keys, values, valueTypes)
+
+def readKA2(stream):
+    version, stringCount = readKAHeader(stream)
+    if version != Versions.V2:
+        raise KAReadError(f"Version mismatch: expected 2 but got {version}")
+
+    return readKA2Body(stream, stringCount)
 
 def readKA258(stream, stringTable):
     version, nodeCount = readKAHeader(stream)
-    if version != 258:
+    if version != Versions.V258:
         raise KAReadError(f"Version mismatch, expected 258 but got {version}")
-    elif nodeCount == 0:
-        return {}
 
-    archive = {}
+    return readKABody(stream, version, nodeCount, stringTable)
+
+'''
+Schema reader
+
+SCG files hold thousands of version 1 archives with the same keys and
+value types, so the key strings and type bytes of every pair are the
+same bytes each time. A schema learnt from one archive checks those
+bytes and unpacks runs of fixed size values with one precompiled struct.
+'''
+# Fixed size value types that can be part of a struct run
+ScalarCodes = {
+    Types.BOOLEAN: "?",
+    Types.INT32: "i",
+    Types.FLOAT: "f",
+    Types.UINT32: "I",
+    Types.INT64: "q",
+    Types.UINT64: "Q",
+    Types.FLOAT64: "d",
+    Types.INT8: "b",
+    Types.UINT8: "B",
+    Types.INT16: "h",
+    Types.UINT16: "H"
+}
+LengthTypes = (Types.STRING, Types.WIDE_STRING, Types.BYTE_ARRAY)
+
+# Bytes of a pair up to its value: key type, key length, key, value type
+def getPairPrefix(key, valueType):
+    keyBytes = key.encode("utf-8")
+    return bytes((Types.STRING,)) + len(keyBytes).to_bytes(4, "little") + keyBytes + bytes((valueType,))
+
+# Run of fixed size pairs unpacked with one struct, optionally followed by
+# the prefix (and length) of a pair with any other type of value
+class SchemaStep:
+    def __init__(self, prefixes, codes, valueType):
+        # Expected pair prefixes, every one is checked
+        self.prefixes = tuple(prefixes)
+        self.scalarCount = len(codes)
+        # None, a length prefixed type or anything else, which is read the generic way
+        self.valueType = valueType
+
+        fmt = "<" + "".join(f"{len(prefix)}s{code}" for prefix, code in zip(prefixes, codes))
+        if valueType is not None:
+            fmt += f"{len(prefixes[-1])}s"
+            if valueType in LengthTypes:
+                fmt += "I"
+        self.struct = Struct(fmt)
+
+# Decoder for archives with one exact key and value type layout
+class KASchema:
+    def __init__(self, layout):
+        # (key, value type) of every pair
+        self.layout = tuple(layout)
+        self.header = b"KA" + Versions.V1.to_bytes(2, "little") + len(self.layout).to_bytes(4, "little")
+        self.keyIndex = getKeyIndex(tuple(key for key, _ in self.layout))
+        self.valueTypes = getValueTypes(valueType for _, valueType in self.layout)
+
+        # Fixed size pairs are gathered into a run until a pair that isn't
+        self.steps = []
+        prefixes = []
+        codes = []
+        for key, valueType in self.layout:
+            prefixes.append(getPairPrefix(key, valueType))
+            if valueType in ScalarCodes:
+                codes.append(ScalarCodes[valueType])
+                continue
+            self.steps.append(SchemaStep(prefixes, codes, valueType))
+            prefixes = []
+            codes = []
+        if prefixes:
+            self.steps.append(SchemaStep(prefixes, codes, None))
+
+    # Only archives with unique string keys can be compiled
+    @classmethod
+    def fromLayout(self, layout):
+        keys = [key for _, key, _ in layout]
+        if any(keyType != Types.STRING for keyType, _, _ in layout) or len(set(keys)) != len(keys):
+            return None
+        return self([(key, valueType) for _, key, valueType in layout])
+
+    # Archive at the stream's position or None if it doesn't match, the stream only moves on a match
+    def read(self, stream):
+        view = stream.view
+        start = stream.offset
+        if view[start:start + 8] != self.header:
+            return None
+        offset = start + 8
+
+        values = []
+        matched = False
+        try:
+            for step in self.steps:
+                unpacked = step.struct.unpack_from(view, offset)
+                if unpacked[0::2] != step.prefixes:
+                    return None
+                offset += step.struct.size
+                values.extend(unpacked[1:2 * step.scalarCount:2])
+
+                valueType = step.valueType
+                if valueType is None:
+                    continue
+                if valueType in LengthTypes:
+                    length = unpacked[-1]
+                    if offset + length > len(view):
+                        return None
+                    value = view[offset:offset + length]
+                    offset += length
+                    values.append(value if valueType == Types.BYTE_ARRAY else str(value, "utf-8"))
+                else:
+                    stream.offset = offset
+                    values.append(V1DataReader.readValue(stream, valueType))
+                    offset = stream.offset
+            matched = True
+        except (StructError, EOFError, KAReadError):
+            return None
+        finally:
+            # Nested values move the stream, put it back on any mismatch
+            if not matched:
+                stream.offset = start
+
+        stream.offset = offset
+        archive = KeyedArchive.__new__(KeyedArchive)
+        archive.keyIndex = self.keyIndex
+        archive.values = values
+        archive.valueTypes = self.valueTypes
+        return archive
+
+# Version 1 archive along with its (key type, key, value type) layout
+def readKA1Layout(stream):
+    version, nodeCount = readKAHeader(stream)
+    if version != Versions.V1:
+        raise KAReadError(f"Version mismatch: expected 1 but got {version}")
+
+    keys = []
+    values = []
+    layout = []
     for _ in range(nodeCount):
-        key, value = V2DataReader.readPair(stream, stringTable)
-        archive[key] = value
-    
-    return archive
+        keyType = stream.readInt8(False)
+        key = V1DataReader.readValue(stream, keyType)
+        valueType = stream.readInt8(False)
+        keys.append(key)
+        values.append(V1DataReader.readValue(stream, valueType))
+        layout.append((keyType, key, valueType))
+
+    return (KeyedArchive(keys, values, [valueType for _, _, valueType in layout]), layout)
+
+# Reads version 1 archives like readKA1, layouts it has seen are read with
+# a compiled KASchema and anything that doesn't match goes through the
+# generic reader, which learns its layout. Schemas need a MemoryBuffer.
+class KA1SchemaReader:
+    def __init__(self):
+        # Latest schema for each archive header (magic, version and pair count)
+        self.schemas = {}
+
+    def read(self, stream):
+        view = getattr(stream, "view", None)
+        if view is None:
+            return readKA1(stream)
+
+        offset = stream.offset
+        header = bytes(view[offset:offset + 8])
+        schema = self.schemas.get(header)
+        if schema is not None:
+            archive = schema.read(stream)
+            if archive is not None:
+                return archive
+
+        archive, layout = readKA1Layout(stream)
+        schema = KASchema.fromLayout(layout)
+        if schema is not None:
+            self.schemas[header] = schema
+
+        return archive
+
+'''
+Lazy KA reader
+'''
+# Dict-like archive that only records where its values are, a value is
+# decoded when it's accessed and nested archives and arrays stay lazy
+class LazyKA(Mapping):
+    def __init__(self, stream, stringTable=None):
+        self.stream = stream
+        self.stringTable = stringTable
+
+        self.version, nodeCount = readKAHeader(stream)
+        if self.version == Versions.V2:
+            self.stringTable = readStringTable(stream, nodeCount)
+            nodeCount = stream.readInt32(False)
+        elif self.version == Versions.V258 and stringTable is None:
+            raise KAReadError("Version 258 archive outside of a version 2 archive")
+        elif self.version not in (Versions.V1, Versions.V258, Versions.EMPTY):
+            raise KAReadError(f"Unknown version: {self.version}")
+
+        # key: (value type, value offset)
+        self.locations = {}
+        for _ in range(nodeCount):
+            if self.version == Versions.V1:
+                key = V1DataReader.readValue(stream, stream.readInt8(False))
+                valueType = stream.readInt8(False)
+                self.locations[key] = (valueType, stream.tell())
+                V1DataReader.skipValue(stream, valueType)
+            else:
+                key = self.stringTable[ stream.readInt32(False) ]
+                valueType = stream.readInt8(False)
+                self.locations[key] = (valueType, stream.tell())
+                V2DataReader.skipValue(stream, valueType)
+
+    def readValue(self, valueType, offset):
+        self.stream.seek(offset, 0)
+        match valueType:
+            case Types.KEYED_ARCHIVE:
+                length = self.stream.readInt32(False)
+                if length == 0:
+                    return KeyedArchive()
+                return LazyKA(self.stream.readBuffer(length), self.stringTable)
+            case Types.ARRAY:
+                return LazyKAArray(self)
+            case other:
+                if self.version == Versions.V1:
+                    return V1DataReader.readValue(self.stream, valueType)
+                return V2DataReader.readValue(self.stream, valueType, self.stringTable)
+
+    def getValueType(self, key):
+        valueType, _ = self.locations[key]
+        return valueType
+
+    def __getitem__(self, key):
+        return self.readValue(*self.locations[key])
+
+    def __contains__(self, key):
+        return key in self.locations
+
+    def __iter__(self):
+        return iter(self.locations)
+
+    def __len__(self):
+        return len(self.locations)
+
+# Lazy ARRAY value of a LazyKA, its elements are decoded on access
+class LazyKAArray(Sequence):
+    def __init__(self, archive):
+        self.archive = archive
+        stream = archive.stream
+
+        length = stream.readInt32(False)
+        self.locations = []
+        for _ in range(length):
+            valueType = stream.readInt8(False)
+            self.locations.append( (valueType, stream.tell()) )
+            if archive.version == Versions.V1:
+                V1DataReader.skipValue(stream, valueType)
+            else:
+                V2DataReader.skipValue(stream, valueType)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.archive.readValue(*location) for location in self.locations[index]]
+        return self.archive.readValue(*self.locations[index])
+
+    @property
+    def valueTypes(self):
+        return tuple(valueType for valueType, _ in self.locations)
+
+    def __len__(self):
+        return len(self.locations)
+
+'''
+Primitive data writers
+'''
+# Forces the type a value is written as, e.g. TypedValue(Types.COLOR, rgba)
+class TypedValue:
+    def __init__(self, valueType, value):
+        self.type = valueType
+        self.value = value
+
+ScalarStructs = {
+    Types.BOOLEAN: Struct("<?"),
+    Types.INT32: Struct("<i"),
+    Types.FLOAT: Struct("<f"),
+    Types.UINT32: Struct("<I"),
+    Types.INT64: Struct("<q"),
+    Types.UINT64: Struct("<Q"),
+    Types.FLOAT64: Struct("<d"),
+    Types.INT8: Struct("<b"),
+    Types.UINT8: Struct("<B"),
+    Types.INT16: Struct("<h"),
+    Types.UINT16: Struct("<H")
+}
+LengthStruct = Struct("<I")
+HeaderStruct = Struct("<2sHI")
+
+StringTypes = (Types.STRING, Types.WIDE_STRING, Types.FASTNAME, Types.FILEPATH)
+FloatArrayTypes = {
+    (2,): Types.VECTOR2,
+    (3,): Types.VECTOR3,
+    (4,): Types.VECTOR4,
+    (2, 2): Types.MATRIX2,
+    (3, 3): Types.MATRIX3,
+    (4, 4): Types.MATRIX4
+}
+
+# Returns (value type, value) for a python value, the inverse of what the readers return
+def getTypedValue(value):
+    if isinstance(value, TypedValue):
+        return (value.type, value.value)
+
+    if value is None:
+        return (Types.NONE, value)
+    elif isinstance(value, (bool, np.bool_)):
+        return (Types.BOOLEAN, value)
+    elif isinstance(value, (int, np.integer)):
+        if -(1 << 31) <= value < (1 << 31):
+            return (Types.INT32, value)
+        elif 0 <= value < (1 << 32):
+            return (Types.UINT32, value)
+        elif -(1 << 63) <= value < (1 << 63):
+            return (Types.INT64, value)
+        return (Types.UINT64, value)
+    elif isinstance(value, (float, np.floating)):
+        return (Types.FLOAT, value)
+    elif isinstance(value, str):
+        return (Types.STRING, value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        return (Types.BYTE_ARRAY, value)
+    elif isinstance(value, Mapping):
+        return (Types.KEYED_ARCHIVE, value)
+    elif isinstance(value, np.ndarray):
+        if value.dtype.kind == "f" and value.shape in FloatArrayTypes:
+            return (FloatArrayTypes[value.shape], value)
+        return (Types.BYTE_ARRAY, value)
+    elif isinstance(value, tuple):
+        sizes = tuple(np.size(member) for member in value)
+        if sizes == (3, 3):
+            return (Types.AABBOX3, value)
+        elif sizes == (3, 3, 4):
+            return (Types.TRANSFORM, value)
+    elif isinstance(value, (list, LazyKAArray)):
+        return (Types.ARRAY, value)
+
+    raise KAWriteError(f"Can't write value of type {type(value).__name__}")
+
+IntegerRanges = {
+    Types.INT8: (-(1 << 7), (1 << 7) - 1),
+    Types.UINT8: (0, (1 << 8) - 1),
+    Types.INT16: (-(1 << 15), (1 << 15) - 1),
+    Types.UINT16: (0, (1 << 16) - 1),
+    Types.INT32: (-(1 << 31), (1 << 31) - 1),
+    Types.UINT32: (0, (1 << 32) - 1),
+    Types.INT64: (-(1 << 63), (1 << 63) - 1),
+    Types.UINT64: (0, (1 << 64) - 1)
+}
+FloatTypes = (Types.FLOAT, Types.FLOAT64)
+
+# Value to write for one that was read as valueType, it is written as that
+# type again as long as it's still the same kind of value and fits
+def keepValueType(valueType, value):
+    if valueType is None or isinstance(value, TypedValue):
+        return value
+    inferredType, _ = getTypedValue(value)
+    if inferredType == valueType:
+        return value
+
+    if valueType in IntegerRanges:
+        minimum, maximum = IntegerRanges[valueType]
+        kept = inferredType in IntegerRanges and minimum <= value <= maximum
+    elif valueType in FloatTypes:
+        kept = inferredType in FloatTypes
+    elif valueType in StringTypes:
+        kept = inferredType in StringTypes
+    else:
+        kept = valueType == Types.COLOR and inferredType == Types.VECTOR4
+    return TypedValue(valueType, value) if kept else value
+
+# Pairs of an archive to write, values keep the types they were read as
+def getTypedItems(archive):
+    getValueType = getattr(archive, "getValueType", None)
+    if getValueType is None or getattr(archive, "valueTypes", ()) is None:
+        return archive.items()
+    return [(key, keepValueType(getValueType(key), value)) for key, value in archive.items()]
+
+# Members of an ARRAY value to write, like getTypedItems
+def getTypedMembers(array):
+    valueTypes = getattr(array, "valueTypes", None)
+    if valueTypes is None:
+        return array
+    return [keepValueType(valueType, member) for valueType, member in zip(valueTypes, array)]
+
+def getBytes(value):
+    if isinstance(value, np.ndarray):
+        return memoryview(np.ascontiguousarray(value).reshape(-1).view(np.uint8))
+    return memoryview(value).cast("B")
+
+def getFloatBytes(value):
+    if isinstance(value, tuple):
+        value = np.concatenate([np.ravel(member) for member in value])
+    return np.ascontiguousarray(value, dtype="<f4").tobytes()
+
+class V1DataWriter:
+    @classmethod
+    def getPairSize(self, key, value):
+        return 1 + self.getValueSize(Types.STRING, key) + 1 + self.getValueSize(*getTypedValue(value))
+
+    @classmethod
+    def getValueSize(self, valueType, value):
+        if valueType in FixedTypeSizes:
+            return FixedTypeSizes[valueType]
+
+        match valueType:
+            case Types.STRING | Types.WIDE_STRING | Types.FASTNAME | Types.FILEPATH:
+                return 4 + len(value.encode("utf-8"))
+            case Types.BYTE_ARRAY:
+                return 4 + getBytes(value).nbytes
+            case Types.KEYED_ARCHIVE:
+                return 4 + getKA1Size(value)
+            case Types.ARRAY:
+                return 4 + sum(1 + self.getValueSize(*getTypedValue(member)) for member in getTypedMembers(value))
+            case other:
+                raise KAWriteError(f"Unknown data type id: {valueType}")
+
+    @classmethod
+    def packPair(self, buffer, offset, key, value):
+        offset = self.packTypedValue(buffer, offset, Types.STRING, key)
+        return self.packTypedValue(buffer, offset, *getTypedValue(value))
+
+    @classmethod
+    def packTypedValue(self, buffer, offset, valueType, value):
+        buffer[offset] = valueType
+        return self.packValue(buffer, offset + 1, valueType, value)
+
+    # Packs the value into buffer at offset and returns the offset after it
+    @classmethod
+    def packValue(self, buffer, offset, valueType, value):
+        if valueType in ScalarStructs:
+            ScalarStructs[valueType].pack_into(buffer, offset, value)
+            return offset + FixedTypeSizes[valueType]
+
+        match valueType:
+            case Types.NONE:
+                return offset
+            case Types.STRING | Types.WIDE_STRING | Types.FASTNAME | Types.FILEPATH:
+                return packBytes(buffer, offset, value.encode("utf-8"))
+            case Types.BYTE_ARRAY:
+                return packBytes(buffer, offset, getBytes(value))
+            case Types.KEYED_ARCHIVE:
+                size = getKA1Size(value)
+                LengthStruct.pack_into(buffer, offset, size)
+                return packKA1(buffer, offset + 4, value)
+            case Types.ARRAY:
+                LengthStruct.pack_into(buffer, offset, len(value))
+                offset += 4
+                for member in getTypedMembers(value):
+                    offset = self.packTypedValue(buffer, offset, *getTypedValue(member))
+                return offset
+            case Types.VECTOR2 | Types.VECTOR3 | Types.VECTOR4 | Types.MATRIX2 | Types.MATRIX3 | Types.MATRIX4 | Types.COLOR | Types.AABBOX3 | Types.TRANSFORM:
+                data = getFloatBytes(value)
+                if len(data) != FixedTypeSizes[valueType]:
+                    raise KAWriteError(f"Wrong component count for data type id: {valueType}")
+                buffer[offset:offset + len(data)] = data
+                return offset + len(data)
+            case other:
+                raise KAWriteError(f"Unknown data type id: {valueType}")
+
+# Strings are written as ids into the string table of the version 2 archive
+class V2DataWriter:
+    @classmethod
+    def getPairSize(self, key, value, stringIds):
+        return 4 + 1 + self.getValueSize(*getTypedValue(value), stringIds)
+
+    @classmethod
+    def getValueSize(self, valueType, value, stringIds):
+        match valueType:
+            case Types.STRING | Types.WIDE_STRING | Types.FASTNAME | Types.FILEPATH:
+                return 4
+            case Types.KEYED_ARCHIVE:
+                return 4 + getKA258Size(value, stringIds)
+            case Types.ARRAY:
+                return 4 + sum(1 + self.getValueSize(*getTypedValue(member), stringIds) for member in getTypedMembers(value))
+            case other:
+                return V1DataWriter.getValueSize(valueType, value)
+
+    @classmethod
+    def packPair(self, buffer, offset, key, value, stringIds):
+        LengthStruct.pack_into(buffer, offset, stringIds[key])
+        return self.packTypedValue(buffer, offset + 4, *getTypedValue(value), stringIds)
+
+    @classmethod
+    def packTypedValue(self, buffer, offset, valueType, value, stringIds):
+        buffer[offset] = valueType
+        return self.packValue(buffer, offset + 1, valueType, value, stringIds)
+
+    @classmethod
+    def packValue(self, buffer, offset, valueType, value, stringIds):
+        match valueType:
+            case Types.STRING | Types.WIDE_STRING | Types.FASTNAME | Types.FILEPATH:
+                LengthStruct.pack_into(buffer, offset, stringIds[value])
+                return offset + 4
+            case Types.KEYED_ARCHIVE:
+                size = getKA258Size(value, stringIds)
+                LengthStruct.pack_into(buffer, offset, size)
+                return packKA258(buffer, offset + 4, value, stringIds)
+            case Types.ARRAY:
+                LengthStruct.pack_into(buffer, offset, len(value))
+                offset += 4
+                for member in getTypedMembers(value):
+                    offset = self.packTypedValue(buffer, offset, *getTypedValue(member), stringIds)
+                return offset
+            case other:
+                return V1DataWriter.packValue(buffer, offset, valueType, value)
+
+def packBytes(buffer, offset, data):
+    LengthStruct.pack_into(buffer, offset, len(data))
+    offset += 4
+    buffer[offset:offset + len(data)] = data
+    return offset + len(data)
 
 '''
 KA Writers
+
+Archive sizes are computed up front so every archive is packed into a
+single preallocated buffer and written out in one call
 '''
-def writeKAHeader(stream): pass
+def packKAHeader(buffer, offset, version, nodeCount):
+    HeaderStruct.pack_into(buffer, offset, b"KA", version, nodeCount)
+    return offset + HeaderStruct.size
+
+def writeKAHeader(stream, version, nodeCount):
+    buffer = bytearray(HeaderStruct.size)
+    packKAHeader(buffer, 0, version, nodeCount)
+    stream.writeBytes(buffer)
+
+def getKA1Size(archive):
+    return HeaderStruct.size + sum(
+        V1DataWriter.getPairSize(key, value) for key, value in getTypedItems(archive)
+    )
+
+def packKA1(buffer, offset, archive):
+    offset = packKAHeader(buffer, offset, Versions.V1, len(archive))
+    for key, value in getTypedItems(archive):
+        offset = V1DataWriter.packPair(buffer, offset, key, value)
+    return offset
+
+def writeKA1(stream, archive):
+    buffer = bytearray(getKA1Size(archive))
+    packKA1(buffer, 0, archive)
+    stream.writeBytes(buffer)
+
+# Every key and string value in the archive tree, in first seen order
+def collectStrings(archive, stringIds):
+    for key, value in getTypedItems(archive):
+        stringIds.setdefault(key, len(stringIds))
+        collectValueStrings(value, stringIds)
+    return stringIds
+
+def collectValueStrings(value, stringIds):
+    valueType, value = getTypedValue(value)
+    if valueType in StringTypes:
+        stringIds.setdefault(value, len(stringIds))
+    elif valueType == Types.KEYED_ARCHIVE:
+        collectStrings(value, stringIds)
+    elif valueType == Types.ARRAY:
+        for member in getTypedMembers(value):
+            collectValueStrings(member, stringIds)
+
+def getKA2Size(archive, stringIds):
+    return (
+        HeaderStruct.size +
+        sum(2 + len(string.encode("utf-8")) for string in stringIds) +
+        4 * len(stringIds) +
+        4 +
+        sum(V2DataWriter.getPairSize(key, value, stringIds) for key, value in getTypedItems(archive))
+    )
+
+def packKA2(buffer, offset, archive, stringIds):
+    offset = packKAHeader(buffer, offset, Versions.V2, len(stringIds))
+    for string in stringIds:
+        data = string.encode("utf-8")
+        ScalarStructs[Types.UINT16].pack_into(buffer, offset, len(data))
+        buffer[offset + 2:offset + 2 + len(data)] = data
+        offset += 2 + len(data)
+    for stringID in stringIds.values():
+        LengthStruct.pack_into(buffer, offset, stringID)
+        offset += 4
+
+    LengthStruct.pack_into(buffer, offset, len(archive))
+    offset += 4
+    for key, value in getTypedItems(archive):
+        offset = V2DataWriter.packPair(buffer, offset, key, value, stringIds)
+    return offset
+
+def writeKA2(stream, archive):
+    stringIds = collectStrings(archive, {})
+    buffer = bytearray(getKA2Size(archive, stringIds))
+    packKA2(buffer, 0, archive, stringIds)
+    stream.writeBytes(buffer)
 
-def writeKA1(stream): pass
+def getKA258Size(archive, stringIds):
+    return HeaderStruct.size + sum(
+        V2DataWriter.getPairSize(key, value, stringIds) for key, value in getTypedItems(archive)
+    )
 
-def writeKA2(stream): pass
+def packKA258(buffer, offset, archive, stringIds):
+    offset = packKAHeader(buffer, offset, Versions.V258, len(archive))
+    for key, value in getTypedItems(archive):
+        offset = V2DataWriter.packPair(buffer, offset, key, value, stringIds)
+    return offset
 
-def writeKA258(stream): pass
+# stringIds maps every string in the archive to its id in the parent version 2 archive
+def writeKA258(stream, archive, stringIds):
+    buffer = bytearray(getKA258Size(archive, stringIds))
+    packKA258(buffer, 0, archive, stringIds)
+    stream.writeBytes(buffer)
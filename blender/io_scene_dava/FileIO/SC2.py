@@ -0,0 +1,162 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+from .KA import readKA, LazyKA
+from .StreamBuffer import MemoryBuffer
+from .DVPL import mapFile
+
+from collections.abc import Mapping
+
+import mmap
+
+'''
+Errors
+'''
+class SC2ReadError(RuntimeError): pass
+
+'''
+SC2 reader
+'''
+# IDs are stored as integers or as 8 byte blobs like polygon group "#id"s
+def toID(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return int.from_bytes(value, "little")
+    return int(value)
+
+def readSC2Header(stream):
+    if stream.readBytes(4) != b"SFV2":
+        raise SC2ReadError("Invalid magic string")
+
+    version = stream.readInt32(False)
+    nodeCount = stream.readInt32(False)
+
+    return (version, nodeCount)
+
+# Entity of the scene hierarchy, children are only decoded when iterated
+class SceneNode:
+    CHILDREN_KEY = "#hierarchy"
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    @property
+    def name(self):
+        return self.archive.get("name")
+
+    def getChildren(self):
+        for child in self.archive.get(self.CHILDREN_KEY, ()):
+            yield SceneNode(child)
+
+    def getComponents(self):
+        components = self.archive.get("components")
+        if not isinstance(components, Mapping):
+            return
+        for component in components.values():
+            if isinstance(component, Mapping):
+                yield component
+
+    # Render batch archives of the node's render components
+    def getRenderBatches(self):
+        for component in self.getComponents():
+            renderObject = component.get("rc.renderObj")
+            if not isinstance(renderObject, Mapping):
+                continue
+
+            batches = renderObject.get("ro.batches")
+            if isinstance(batches, Mapping):
+                batches = batches.values()
+            elif batches is None:
+                batches = (renderObject.get(f"ro.batch{i}") for i in range(renderObject.get("ro.batchCount", 0)))
+            for batch in batches:
+                if isinstance(batch, Mapping):
+                    yield batch
+
+    # Depth first, subtrees are skipped when descend returns False for their root
+    def walk(self, descend=None):
+        yield self
+        if descend is not None and not descend(self):
+            return
+        for child in self.getChildren():
+            yield from child.walk(descend)
+
+# Memory maps an SC2 file, the body is a LazyKA so nothing but the
+# header, version tags and string table is decoded up front
+class SC2File:
+    # .dvpl files are decompressed in memory, buffer is an optional DVPLBuffer to decompress into
+    def __init__(self, filepath, buffer=None):
+        self.map, self.view = mapFile(filepath, buffer)
+        self.stream = MemoryBuffer(self.view)
+
+        self.version, self.nodeCount = readSC2Header(self.stream)
+        self.versionTags = readKA(self.stream)
+        descriptorSize = self.stream.readInt32(False)
+        self.descriptor = self.stream.readBytes(descriptorSize)
+        self.body = LazyKA(self.stream)
+
+    # Data nodes, i.e. materials
+    def getDataNodes(self):
+        return self.body.get("#dataNodes", ())
+
+    def getMaterials(self):
+        for node in self.getDataNodes():
+            if node.get("##name") == "NMaterial":
+                yield node
+
+    # Material archive of every polygon group used by a render batch in the
+    # hierarchy, by polygon group ID. Batches point at their group and
+    # material with "rb.datasource" and "rb.nmatname", anything missing is skipped.
+    def getPolygonGroupMaterials(self):
+        materials = {}
+        for material in self.getMaterials():
+            key = material.get("materialKey", material.get("#id"))
+            if key is not None:
+                materials[toID(key)] = material
+
+        groupMaterials = {}
+        for root in self.getHierarchy():
+            for node in root.walk():
+                for batch in node.getRenderBatches():
+                    groupID = batch.get("rb.datasource")
+                    materialKey = batch.get("rb.nmatname")
+                    if groupID is None or materialKey is None:
+                        continue
+                    material = materials.get(toID(materialKey))
+                    if material is not None:
+                        groupMaterials[toID(groupID)] = material
+
+        return groupMaterials
+
+    def getHierarchy(self):
+        for archive in self.body.get("#hierarchy", ()):
+            yield SceneNode(archive)
+
+    # Every node of the hierarchy that matches, e.g.
+    # scene.findNodes(lambda node: node.name.endswith("lod0"))
+    def findNodes(self, predicate):
+        for root in self.getHierarchy():
+            for node in root.walk():
+                if predicate(node):
+                    yield node
+
+    def close(self):
+        self.view.release()
+        if not isinstance(self.map, mmap.mmap):
+            return
+        try:
+            self.map.close()
+        except BufferError:
+            # Decoded values still reference the map, it gets unmapped once they're gone
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
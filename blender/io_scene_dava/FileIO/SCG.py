@@ -8,7 +8,15 @@ The above copyright notice and this permission notice shall be included in all c
 THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
-from .KA import readKA1
+from .KA import KA1SchemaReader, writeKA1
+from .StreamBuffer import MemoryBuffer
+from .DVPL import mapFile
+
+from hashlib import blake2b
+from struct import Struct
+import json
+import mmap
+import os
 
 '''
 Errors
@@ -19,7 +27,7 @@ class SCGWriteError(RuntimeError): pass
 '''
 SCG reader
 '''
-def readSCG(stream):
+def readSCGHeader(stream):
     if stream.readBytes(4) != B"SCPG":
         raise SCGReadError("Invalid magic string")
 
@@ -27,17 +35,181 @@ def readSCG(stream):
     nodeCount = stream.readInt32(False)
     stream.readInt32(False) #TODO: Duplicate node count field?
 
+    return (version, nodeCount)
+
+# Everything that makes two polygon groups decode to the same geometry, the
+# group ID and name aren't part of it so copies in different files match
+HashHeaderStruct = Struct("<7I")
+
+def getContentHash(node):
+    digest = blake2b(digest_size=16)
+    digest.update(HashHeaderStruct.pack(
+        node["vertexFormat"], node["vertexCount"], node["indexFormat"], node["indexCount"],
+        node["rhi_primitiveType"], node.get("cubeTextureCoordCount", 0), node.get("packing", 0)
+    ))
+    digest.update(node["vertices"])
+    digest.update(node["indices"])
+
+    return digest.hexdigest()
+
+# Pass a dict as contentHashes to have it filled with the content hash of every group
+def readSCG(stream, contentHashes=None):
+    version, nodeCount = readSCGHeader(stream)
+
+    # Polygon groups all share one layout
+    reader = KA1SchemaReader()
     polygonGroups = {}
     for _ in range(nodeCount):
-        node = readKA1(stream)
+        node = reader.read(stream)
         if node["##name"] != "PolygonGroup":
             print("Warning: SCG node wasn't a polygon group, skipping")
             continue
-        polygonGroups[ int.from_bytes(node["#id"], "little") ] = node
+        groupID = int.from_bytes(node["#id"], "little")
+        polygonGroups[groupID] = node
+        if contentHashes is not None:
+            contentHashes[groupID] = getContentHash(node)
 
     return polygonGroups
 
+'''
+Lazy SCG reader
+'''
+# Location of a polygon group archive inside of an SCG file
+class PolygonGroupEntry:
+    def __init__(self, groupID, offset, length, vertexCount, indexCount):
+        self.id = groupID
+        self.offset = offset
+        self.length = length
+        self.vertexCount = vertexCount
+        self.indexCount = indexCount
+        # Hash of the group's geometry, see getContentHash
+        self.contentHash = None
+
+# Memory maps an SCG file and indexes its polygon groups, a group
+# is only decoded when it is accessed and its blobs are views into the map
+class SCGFile:
+    # .dvpl files are decompressed in memory, buffer is an optional DVPLBuffer to decompress into
+    def __init__(self, filepath, buffer=None):
+        self.map, self.view = mapFile(filepath, buffer)
+        self.stream = MemoryBuffer(self.view)
+        self.version, self.nodeCount = readSCGHeader(self.stream)
+        self.reader = KA1SchemaReader()
+
+        self.entries = {}
+        for _ in range(self.nodeCount):
+            self.indexNode()
+
+    # Blobs are views into the map, so reading a whole
+    # archive is as cheap as skipping over its values
+    def indexNode(self):
+        offset = self.stream.tell()
+        values = self.reader.read(self.stream)
+
+        if values.get("##name") != "PolygonGroup":
+            print("Warning: SCG node wasn't a polygon group, skipping")
+            return
+
+        groupID = int.from_bytes(values["#id"], "little")
+        self.entries[groupID] = PolygonGroupEntry(
+            groupID, offset, self.stream.tell() - offset,
+            values.get("vertexCount", 0), values.get("indexCount", 0)
+        )
+
+    def __getitem__(self, groupID):
+        entry = self.entries[groupID]
+        self.stream.seek(entry.offset, 0)
+        return self.reader.read(self.stream)
+
+    def __contains__(self, groupID):
+        return groupID in self.entries
+
+    # Hashed from the group's blobs the first time it's asked for
+    def getContentHash(self, groupID):
+        entry = self.entries[groupID]
+        if entry.contentHash is None:
+            entry.contentHash = getContentHash(self[groupID])
+        return entry.contentHash
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def keys(self):
+        return self.entries.keys()
+
+    def close(self):
+        self.view.release()
+        if not isinstance(self.map, mmap.mmap):
+            return
+        try:
+            self.map.close()
+        except BufferError:
+            # Decoded groups still reference the map, it gets unmapped once they're gone
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
 '''
 SCG writer
 '''
-def writeScg(stream): pass
+# Node counts are patched in once every archive has been written, so
+# polygonGroups can be any iterable of archives (e.g. a generator)
+def writeSCG(stream, polygonGroups):
+    start = stream.tell()
+    stream.writeBytes(b"SCPG")
+    stream.writeInt32(1)
+    stream.writeInt32(0)
+    stream.writeInt32(0)
+
+    nodeCount = 0
+    for archive in polygonGroups:
+        if archive.get("##name") != "PolygonGroup":
+            raise SCGWriteError("SCG nodes must be polygon groups")
+        writeKA1(stream, archive)
+        nodeCount += 1
+
+    end = stream.tell()
+    stream.seek(start + 8, 0)
+    stream.writeInt32(nodeCount)
+    stream.writeInt32(nodeCount)
+    stream.seek(end, 0)
+
+    return nodeCount
+
+'''
+LOD manifest
+'''
+# SCG files have nowhere to say which groups are LODs of which, exports with
+# generated LODs write it next to the file:
+#
+#   {"meshes": [{"name": "Hull", "lods": [[0, 1], [2], [3]]}, ...]}
+#
+# lods[0] are the mesh's own groups, lods[n] the groups of its nth LOD.
+def getLODManifestPath(filepath):
+    if filepath.endswith(".dvpl"):
+        filepath = filepath[:-len(".dvpl")]
+    return filepath + ".lods.json"
+
+def writeLODManifest(filepath, meshes):
+    manifest = {"meshes": [{"name": name, "lods": lods} for name, lods in meshes.items()]}
+    with open(getLODManifestPath(filepath), "w") as file:
+        json.dump(manifest, file, indent=4)
+
+# LOD level of every group listed by the manifest of an SCG file, empty without one
+def readLODManifest(filepath):
+    manifestPath = getLODManifestPath(filepath)
+    if not os.path.exists(manifestPath):
+        return {}
+
+    with open(manifestPath, "r") as file:
+        manifest = json.load(file)
+    return {
+        groupID: level
+        for mesh in manifest["meshes"] for level, groupIDs in enumerate(mesh["lods"]) for groupID in groupIDs
+    }
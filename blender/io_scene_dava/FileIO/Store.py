@@ -0,0 +1,78 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+from .Cache import writeCacheFile, readCacheFile
+
+import json
+import os
+
+'''
+Geometry store
+'''
+# Pack wide content addressed store of polygon group archives, every
+# distinct group is stored once as a cache file named after its content
+# hash. Files reference their groups through manifests:
+#
+#   {"source": "Tanks/German/Maus.scg", "groups": {"0": "<hash>", ...}}
+class GeometryStore:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    # Entries are spread over subdirectories by the first two hash digits
+    def getEntryPath(self, contentHash):
+        return os.path.join(self.directory, contentHash[:2], f"{contentHash}.dvcc")
+
+    def __contains__(self, contentHash):
+        return os.path.exists(self.getEntryPath(contentHash))
+
+    # Returns False when the group was already stored, when several processes
+    # store the same group at once only one of them gets True
+    def store(self, contentHash, node):
+        entryPath = self.getEntryPath(contentHash)
+        if os.path.exists(entryPath):
+            return False
+
+        os.makedirs(os.path.dirname(entryPath), exist_ok=True)
+        return writeCacheFile(entryPath, {contentHash: node}, exclusive=True)
+
+    # Blobs are views into a memory map of the entry
+    def load(self, contentHash):
+        return readCacheFile(self.getEntryPath(contentHash))[contentHash]
+
+    '''
+    Manifests
+    '''
+    def writeManifest(self, manifestPath, source, groupHashes):
+        manifest = {
+            "source": source,
+            "groups": {str(groupID): contentHash for groupID, contentHash in groupHashes.items()}
+        }
+        with open(manifestPath, "w") as file:
+            json.dump(manifest, file, indent=4)
+
+    # Content hash of every group of a manifest by group ID
+    def readManifest(self, manifestPath):
+        with open(manifestPath, "r") as file:
+            manifest = json.load(file)
+        return {int(groupID): contentHash for groupID, contentHash in manifest["groups"].items()}
+
+    # Polygon group archives of a manifest by group ID, groups repeated within the manifest are only read once.
+    # Entries keep the ID of whichever file stored them first, every group gets its own copy with its own ID.
+    def loadManifest(self, manifestPath):
+        nodes = {}
+        loaded = {}
+        for groupID, contentHash in self.readManifest(manifestPath).items():
+            if contentHash not in loaded:
+                loaded[contentHash] = self.load(contentHash)
+            node = nodes[groupID] = dict(loaded[contentHash])
+            node["#id"] = groupID.to_bytes(8, "little")
+
+        return nodes
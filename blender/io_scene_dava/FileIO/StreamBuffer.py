@@ -8,7 +8,13 @@ The above copyright notice and this permission notice shall be included in all c
 THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
-from struct import unpack, pack
+from struct import unpack, pack, unpack_from, Struct
+from io import BytesIO
+
+ENDIAN_PREFIXES = {
+    "little": "<",
+    "big": ">"
+}
 
 # Utility class that provides a nice
 # abstraction for common binary IO tasks
@@ -49,6 +55,14 @@ class StreamBuffer:
         value = int.from_bytes(value, byteorder=self.endian, signed=signed)
         return value
 
+    def readInt16s(self, count, signed=True):
+        value = self.stream.read(2 * count)
+        return unpack(f"{ENDIAN_PREFIXES[self.endian]}{count}{'h' if signed else 'H'}", value)
+
+    def readInt32s(self, count, signed=True):
+        value = self.stream.read(4 * count)
+        return unpack(f"{ENDIAN_PREFIXES[self.endian]}{count}{'i' if signed else 'I'}", value)
+
     def writeInt8(self, value):
         binData = value.to_bytes(1)
         self.stream.write(binData)
@@ -84,6 +98,10 @@ class StreamBuffer:
         (value,) = value
         return value
 
+    def readFloats(self, count):
+        value = self.stream.read(4 * count)
+        return unpack(f"{ENDIAN_PREFIXES[self.endian]}{count}f", value)
+
     def writeDouble(self, value):
         binData = bytearray(pack("d", value))
         self.stream.write(binData)
@@ -107,5 +125,125 @@ class StreamBuffer:
         value = self.stream.read(count)
         return value
 
+    # Reads count bytes into a new buffer, used for nested data like keyed archives
+    def readBuffer(self, count):
+        return StreamBuffer(BytesIO(self.stream.read(count)), self.endian)
+
     def writeBytes(self, value):
         self.stream.write(value)
+
+# Precompiled structs for every scalar type, per byte order
+def compileStructs(endian):
+    prefix = ENDIAN_PREFIXES[endian]
+    return {fmt: Struct(prefix + fmt) for fmt in "bBhHiIqQfd"}
+
+STRUCTS = {endian: compileStructs(endian) for endian in ENDIAN_PREFIXES}
+
+# StreamBuffer over an in memory buffer (bytes, mmap, ...) that reads
+# straight out of a memoryview; bytes and nested buffers are returned as
+# views instead of copies. Read only.
+class MemoryBuffer:
+    def __init__(self, buffer, endian="little"):
+        self.view = memoryview(buffer).cast("B")
+        self.offset = 0
+        self.endian = endian
+        self.prefix = ENDIAN_PREFIXES[endian]
+
+        structs = STRUCTS[endian]
+        self.int8 = structs["b"].unpack_from
+        self.uint8 = structs["B"].unpack_from
+        self.int16 = structs["h"].unpack_from
+        self.uint16 = structs["H"].unpack_from
+        self.int32 = structs["i"].unpack_from
+        self.uint32 = structs["I"].unpack_from
+        self.int64 = structs["q"].unpack_from
+        self.uint64 = structs["Q"].unpack_from
+        self.float = structs["f"].unpack_from
+        self.double = structs["d"].unpack_from
+
+    '''
+    io passthrough functions
+    '''
+    def tell(self):
+        return self.offset
+
+    def seek(self, offset, mode):
+        if mode == 0:
+            self.offset = offset
+        elif mode == 1:
+            self.offset += offset
+        elif mode == 2:
+            self.offset = len(self.view) + offset
+
+    '''
+    Int functions
+    '''
+    def readInt8(self, signed=True):
+        (value,) = (self.int8 if signed else self.uint8)(self.view, self.offset)
+        self.offset += 1
+        return value
+
+    def readInt16(self, signed=True):
+        (value,) = (self.int16 if signed else self.uint16)(self.view, self.offset)
+        self.offset += 2
+        return value
+
+    def readInt32(self, signed=True):
+        (value,) = (self.int32 if signed else self.uint32)(self.view, self.offset)
+        self.offset += 4
+        return value
+
+    def readInt64(self, signed=True):
+        (value,) = (self.int64 if signed else self.uint64)(self.view, self.offset)
+        self.offset += 8
+        return value
+
+    def readInt16s(self, count, signed=True):
+        value = unpack_from(f"{self.prefix}{count}{'h' if signed else 'H'}", self.view, self.offset)
+        self.offset += 2 * count
+        return value
+
+    def readInt32s(self, count, signed=True):
+        value = unpack_from(f"{self.prefix}{count}{'i' if signed else 'I'}", self.view, self.offset)
+        self.offset += 4 * count
+        return value
+
+    '''
+    Decimal
+    '''
+    def readFloat(self):
+        (value,) = self.float(self.view, self.offset)
+        self.offset += 4
+        return value
+
+    def readDouble(self):
+        (value,) = self.double(self.view, self.offset)
+        self.offset += 8
+        return value
+
+    def readFloats(self, count):
+        value = unpack_from(f"{self.prefix}{count}f", self.view, self.offset)
+        self.offset += 4 * count
+        return value
+
+    '''
+    String
+    '''
+    def readString(self, count):
+        value = str(self.readBytes(count), "utf-8")
+        return value
+
+    '''
+    Binary
+    '''
+    def readBytes(self, count):
+        if self.offset + count > len(self.view):
+            raise EOFError(f"Tried to read {count} bytes at {self.offset} past the end of the buffer")
+
+        value = self.view[self.offset:self.offset + count]
+        self.offset += count
+        return value
+
+    # Nested buffers share memory with this one
+    def readBuffer(self, count):
+        return MemoryBuffer(self.readBytes(count), self.endian)
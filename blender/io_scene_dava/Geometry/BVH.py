@@ -0,0 +1,417 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+import numpy as np
+
+from .PolygonGroup import getBounds
+
+'''
+Helpers
+'''
+def dot(a, b):
+    return np.einsum("ij,ij->i", a, b)
+
+# Spreads the low 10 bits of every value out to every third bit
+def expandBits(values):
+    values = values.astype(np.uint32)
+    values = (values * 0x00010001) & 0xFF0000FF
+    values = (values * 0x00000101) & 0x0F00F00F
+    values = (values * 0x00000011) & 0xC30C30C3
+    values = (values * 0x00000005) & 0x49249249
+    return values
+
+# 30 bit Morton codes of points inside of bounds, nearby points get nearby codes
+def getMortonCodes(points, bounds):
+    boundsMin, boundsMax = bounds
+    extent = np.maximum(boundsMax - boundsMin, 1e-30)
+    cells = np.clip((points - boundsMin) / extent * 1023, 0, 1023)
+    return (expandBits(cells[:, 0]) << 2) | (expandBits(cells[:, 1]) << 1) | expandBits(cells[:, 2])
+
+# Closest point on each triangle (a, b, c) to each point p, from
+# "Real-Time Collision Detection" (Ericson 2004) 5.1.5 with every
+# Voronoi region evaluated for all pairs and picked with masks
+def closestPointOnTriangle(p, a, b, c):
+    ab = b - a
+    ac = c - a
+    ap = p - a
+    bp = p - b
+    cp = p - c
+    d1 = dot(ab, ap)
+    d2 = dot(ac, ap)
+    d3 = dot(ab, bp)
+    d4 = dot(ac, bp)
+    d5 = dot(ab, cp)
+    d6 = dot(ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = 1.0 / (va + vb + vc)
+        closest = a + ab * (vb * denominator)[:, None] + ac * (vc * denominator)[:, None]
+
+        # Regions from the least to the most specific test so the right one wins
+        edgeBC = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+        w = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        closest = np.where(edgeBC[:, None], b + (c - b) * w[:, None], closest)
+
+        edgeAC = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        closest = np.where(edgeAC[:, None], a + ac * (d2 / (d2 - d6))[:, None], closest)
+
+        closest = np.where(((d6 >= 0) & (d5 <= d6))[:, None], c, closest)
+
+        edgeAB = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        closest = np.where(edgeAB[:, None], a + ab * (d1 / (d1 - d3))[:, None], closest)
+
+        closest = np.where(((d3 >= 0) & (d4 <= d3))[:, None], b, closest)
+        closest = np.where(((d1 <= 0) & (d2 <= 0))[:, None], a, closest)
+
+    return closest
+
+# Separating axis test of triangles (a, b, c) against boxes, from
+# "Fast 3D Triangle-Box Overlap Testing" (Akenine-Möller 2001)
+def triangleOverlapsBox(a, b, c, boxMin, boxMax):
+    center = (boxMin + boxMax) * 0.5
+    halfSize = (boxMax - boxMin) * 0.5
+    vertices = (a - center, b - center, c - center)
+    edges = (vertices[1] - vertices[0], vertices[2] - vertices[1], vertices[0] - vertices[2])
+
+    def separated(axis):
+        projections = np.stack([dot(vertex, axis) for vertex in vertices])
+        radius = dot(halfSize, np.abs(axis))
+        return (projections.min(axis=0) > radius) | (projections.max(axis=0) < -radius)
+
+    # Box face normals
+    overlaps = np.ones(len(a), dtype=bool)
+    for i in range(3):
+        components = np.stack([vertex[:, i] for vertex in vertices])
+        overlaps &= (components.min(axis=0) <= halfSize[:, i]) & (components.max(axis=0) >= -halfSize[:, i])
+
+    # Triangle normal
+    normal = np.cross(edges[0], edges[1])
+    overlaps &= np.abs(dot(normal, vertices[0])) <= dot(halfSize, np.abs(normal))
+
+    # Edge and box axis cross products
+    for edge in edges:
+        for i in range(3):
+            axis = np.zeros_like(edge)
+            axis[:, (i + 1) % 3] = -edge[:, (i + 2) % 3]
+            axis[:, (i + 2) % 3] = edge[:, (i + 1) % 3]
+            overlaps &= ~separated(axis)
+
+    return overlaps
+
+'''
+Query results
+'''
+class RayHits:
+    def __init__(self, distances, triangles, barycentrics):
+        # Distance along the ray in multiples of its direction, inf for misses
+        self.distances = distances
+        # Hit triangle of every ray, -1 for misses
+        self.triangles = triangles
+        # (u, v) of the hit, the point is a + u * (b - a) + v * (c - a)
+        self.barycentrics = barycentrics
+
+class NearestPoints:
+    def __init__(self, distances, triangles, points):
+        self.distances = distances
+        self.triangles = triangles
+        self.points = points
+
+'''
+BVH
+'''
+# Bounding volume hierarchy over the triangles of a mesh. Triangles are
+# sorted along a Morton curve and grouped into leaves of leafSize, the
+# tree above is built bottom up by pairing neighbouring nodes so every
+# level is a handful of array operations. Queries run breadth first over
+# whole batches of queries, one level at a time.
+#
+# Nodes are stored level by level from the root down, the children of
+# node i are nodes 2i and 2i + 1 of the next level.
+class BVH:
+    LEAF_SIZE = 4
+
+    def __init__(self, vertices, faces, triangleIDs, levelOffsets, nodeMin, nodeMax, leafSize):
+        self.vertices = vertices
+        # Faces in BVH order, triangleIDs holds the original index of each
+        self.faces = faces
+        self.triangleIDs = triangleIDs
+        self.levelOffsets = levelOffsets
+        self.nodeMin = nodeMin
+        self.nodeMax = nodeMax
+        self.leafSize = leafSize
+        # Sorted Morton codes of the triangles, made when first needed
+        self.mortonCodes = None
+        self.mortonBounds = None
+
+    @classmethod
+    def build(self, vertices, faces, leafSize=LEAF_SIZE):
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        if len(faces) == 0:
+            empty = np.empty((0, 3), dtype=np.float32)
+            return self(vertices, faces, np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64), empty, empty, leafSize)
+
+        triangles = vertices[faces]
+        centroids = triangles.mean(axis=1)
+        triangleIDs = np.argsort(getMortonCodes(centroids, getBounds(centroids)), kind="stable")
+        faces = faces[triangleIDs]
+        triangles = triangles[triangleIDs]
+
+        # Leaves
+        leafStarts = np.arange(0, len(faces), leafSize)
+        levelMin = [np.minimum.reduceat(triangles.min(axis=1), leafStarts)]
+        levelMax = [np.maximum.reduceat(triangles.max(axis=1), leafStarts)]
+
+        # Pair nodes up until there's only the root left, odd nodes out are carried up as they are
+        while len(levelMin[-1]) > 1:
+            childMin = levelMin[-1]
+            childMax = levelMax[-1]
+            pairs = len(childMin) // 2
+            parentMin = np.minimum(childMin[0:2 * pairs:2], childMin[1:2 * pairs:2])
+            parentMax = np.maximum(childMax[0:2 * pairs:2], childMax[1:2 * pairs:2])
+            if len(childMin) % 2:
+                parentMin = np.vstack((parentMin, childMin[-1:]))
+                parentMax = np.vstack((parentMax, childMax[-1:]))
+            levelMin.append(parentMin)
+            levelMax.append(parentMax)
+
+        levelMin.reverse()
+        levelMax.reverse()
+        levelOffsets = np.zeros(len(levelMin) + 1, dtype=np.int64)
+        np.cumsum([len(level) for level in levelMin], out=levelOffsets[1:])
+
+        return self(
+            vertices, faces, triangleIDs, levelOffsets,
+            np.concatenate(levelMin), np.concatenate(levelMax), leafSize
+        )
+
+    @classmethod
+    def fromPolygonGroup(self, group, leafSize=LEAF_SIZE):
+        return self.build(group.vertices, group.getTriangles(), leafSize)
+
+    @property
+    def bounds(self):
+        if len(self.faces) == 0:
+            return None
+        return (self.nodeMin[0], self.nodeMax[0])
+
+    '''
+    Serialization
+
+    Nodes have the same shape as polygon group archives so they can be stored with writeCacheFile
+    '''
+    def toNode(self):
+        return {
+            "leafSize": self.leafSize,
+            "vertexCount": len(self.vertices),
+            "triangleCount": len(self.faces),
+            "vertices": self.vertices.tobytes(),
+            "faces": self.faces.tobytes(),
+            "triangleIDs": self.triangleIDs.tobytes(),
+            "levelOffsets": self.levelOffsets.tobytes(),
+            "nodeMin": self.nodeMin.astype(np.float32).tobytes(),
+            "nodeMax": self.nodeMax.astype(np.float32).tobytes()
+        }
+
+    @classmethod
+    def fromNode(self, node):
+        return self(
+            np.frombuffer(node["vertices"], dtype=np.float32).reshape(-1, 3),
+            np.frombuffer(node["faces"], dtype=np.int64).reshape(-1, 3),
+            np.frombuffer(node["triangleIDs"], dtype=np.int64),
+            np.frombuffer(node["levelOffsets"], dtype=np.int64),
+            np.frombuffer(node["nodeMin"], dtype=np.float32).reshape(-1, 3),
+            np.frombuffer(node["nodeMax"], dtype=np.float32).reshape(-1, 3),
+            node["leafSize"]
+        )
+
+    '''
+    Traversal
+    '''
+    # Pairs of (query, triangle in BVH order) whose nodes pass
+    # test(queries, nodeMin, nodeMax) on every level down to the leaves,
+    # pairs are always sorted by query
+    def getCandidates(self, queryCount, test):
+        queries = np.arange(queryCount)
+        nodes = np.zeros(queryCount, dtype=np.int64)
+        levelCount = len(self.levelOffsets) - 1
+        if len(self.faces) == 0:
+            return (queries[:0], nodes[:0])
+
+        for level in range(levelCount):
+            offset = self.levelOffsets[level]
+            keep = test(queries, self.nodeMin[offset + nodes], self.nodeMax[offset + nodes])
+            queries = queries[keep]
+            nodes = nodes[keep]
+            if level == levelCount - 1:
+                break
+
+            childCount = self.levelOffsets[level + 2] - self.levelOffsets[level + 1]
+            queries = np.repeat(queries, 2)
+            nodes = (nodes[:, None] * 2 + np.arange(2)).ravel()
+            exists = nodes < childCount
+            queries = queries[exists]
+            nodes = nodes[exists]
+
+        # Leaves into their triangles
+        queries = np.repeat(queries, self.leafSize)
+        triangles = (nodes[:, None] * self.leafSize + np.arange(self.leafSize)).ravel()
+        exists = triangles < len(self.faces)
+
+        return (queries[exists], triangles[exists])
+
+    # Triangles (in BVH order) next to each point along the Morton curve, they're
+    # usually close by which makes them a good first guess for nearest queries
+    def getNeighbourTriangles(self, points, count):
+        if self.mortonCodes is None:
+            centroids = self.vertices[self.faces].mean(axis=1)
+            self.mortonBounds = getBounds(centroids)
+            self.mortonCodes = getMortonCodes(centroids, self.mortonBounds)
+
+        positions = np.searchsorted(self.mortonCodes, getMortonCodes(points, self.mortonBounds))
+        starts = np.clip(positions - count // 2, 0, max(len(self.faces) - count, 0))
+        triangles = (starts[:, None] + np.arange(min(count, len(self.faces)))).ravel()
+        queries = np.repeat(np.arange(len(points)), min(count, len(self.faces)))
+
+        return (queries, triangles)
+
+    def getTriangleCorners(self, triangles):
+        corners = self.vertices[self.faces[triangles]]
+        return (corners[:, 0], corners[:, 1], corners[:, 2])
+
+    '''
+    Queries
+    '''
+    # Nearest hit of each ray, triangles are hit from either side
+    def rayCast(self, origins, directions, maxDistance=np.inf):
+        origins = np.asarray(origins, dtype=np.float32).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float32).reshape(-1, 3)
+        with np.errstate(divide="ignore"):
+            inverseDirections = 1.0 / directions
+
+        def test(queries, nodeMin, nodeMax):
+            with np.errstate(invalid="ignore"):
+                near = (nodeMin - origins[queries]) * inverseDirections[queries]
+                far = (nodeMax - origins[queries]) * inverseDirections[queries]
+            # fmin/fmax skip the NaNs of rays lying in a slab's plane
+            entry = np.fmax.reduce(np.fmin(near, far), axis=1)
+            exit = np.fmin.reduce(np.fmax(near, far), axis=1)
+            return (exit >= np.maximum(entry, 0)) & (entry <= maxDistance)
+        queries, triangles = self.getCandidates(len(origins), test)
+
+        # Möller-Trumbore on every candidate pair
+        a, b, c = self.getTriangleCorners(triangles)
+        rayOrigins = origins[queries]
+        rayDirections = directions[queries]
+        edge1 = b - a
+        edge2 = c - a
+        p = np.cross(rayDirections, edge2)
+        determinant = dot(edge1, p)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inverseDeterminant = 1.0 / determinant
+            s = rayOrigins - a
+            u = dot(s, p) * inverseDeterminant
+            q = np.cross(s, edge1)
+            v = dot(rayDirections, q) * inverseDeterminant
+            t = dot(edge2, q) * inverseDeterminant
+        hit = (np.abs(determinant) > 1e-12) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0) & (t <= maxDistance)
+
+        queries, triangles, t, u, v = queries[hit], triangles[hit], t[hit], u[hit], v[hit]
+        # Closest hit per ray is the first one once sorted by ray then distance
+        order = np.lexsort((t, queries))
+        queries, triangles, t, u, v = queries[order], triangles[order], t[order], u[order], v[order]
+        first = np.ones(len(queries), dtype=bool)
+        first[1:] = queries[1:] != queries[:-1]
+
+        distances = np.full(len(origins), np.inf, dtype=np.float32)
+        hitTriangles = np.full(len(origins), -1, dtype=np.int64)
+        barycentrics = np.zeros((len(origins), 2), dtype=np.float32)
+        distances[queries[first]] = t[first]
+        hitTriangles[queries[first]] = self.triangleIDs[triangles[first]]
+        barycentrics[queries[first]] = np.stack((u[first], v[first]), axis=1)
+
+        return RayHits(distances, hitTriangles, barycentrics)
+
+    # Every (box, triangle) pair where the triangle touches the box
+    def overlapBoxes(self, boxMin, boxMax):
+        boxMin = np.asarray(boxMin, dtype=np.float32).reshape(-1, 3)
+        boxMax = np.asarray(boxMax, dtype=np.float32).reshape(-1, 3)
+
+        def test(queries, nodeMin, nodeMax):
+            return np.all((nodeMin <= boxMax[queries]) & (nodeMax >= boxMin[queries]), axis=1)
+        queries, triangles = self.getCandidates(len(boxMin), test)
+
+        a, b, c = self.getTriangleCorners(triangles)
+        overlaps = triangleOverlapsBox(a, b, c, boxMin[queries], boxMax[queries])
+
+        return (queries[overlaps], self.triangleIDs[triangles[overlaps]])
+
+    # Triangles touching a single box, e.g. bvh.getTrianglesInBox((0, 0, 0), (1, 1, 1))
+    def getTrianglesInBox(self, boxMin, boxMax):
+        _, triangles = self.overlapBoxes(boxMin, boxMax)
+        return np.sort(triangles)
+
+    # Closest point on the mesh to each point
+    def findNearest(self, points, maxDistance=np.inf):
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        # Squared distance every point is known to have a triangle within,
+        # starting with the distance to the triangles next to it on the Morton curve
+        upperBounds = np.full(len(points), maxDistance * maxDistance, dtype=np.float64)
+        if len(self.faces):
+            queries, triangles = self.getNeighbourTriangles(points, 2 * self.leafSize)
+            a, b, c = self.getTriangleCorners(triangles)
+            distances = np.sum((closestPointOnTriangle(points[queries], a, b, c) - points[queries]) ** 2, axis=1)
+            distances = np.where(np.isnan(distances), np.inf, distances).reshape(len(points), -1)
+            upperBounds = np.minimum(upperBounds, distances.min(axis=1))
+
+        def test(queries, nodeMin, nodeMax):
+            queryPoints = points[queries]
+            nearest = np.sum(np.maximum(np.maximum(nodeMin - queryPoints, queryPoints - nodeMax), 0) ** 2, axis=1)
+
+            # Node boxes are tight so a triangle touches every face, the closest
+            # face's farthest point bounds the distance (MINMAXDIST, Roussopoulos et al. 1995)
+            nearFaces = np.where(queryPoints <= (nodeMin + nodeMax) * 0.5, nodeMin, nodeMax)
+            farFaces = np.where(queryPoints >= (nodeMin + nodeMax) * 0.5, nodeMin, nodeMax)
+            nearDistances = (queryPoints - nearFaces) ** 2
+            farDistances = (queryPoints - farFaces) ** 2
+            bound = np.min(farDistances.sum(axis=1)[:, None] - farDistances + nearDistances, axis=1)
+
+            # Pairs stay sorted by query, so each query's bounds are one segment
+            if len(queries):
+                starts = np.flatnonzero(np.diff(queries, prepend=-1))
+                segmentBounds = np.minimum.reduceat(bound, starts)
+                upperBounds[queries[starts]] = np.minimum(upperBounds[queries[starts]], segmentBounds)
+            # A little slack so float32 rounding can't prune the nearest triangle's node
+            return nearest <= upperBounds[queries] * 1.0001
+        queries, triangles = self.getCandidates(len(points), test)
+
+        a, b, c = self.getTriangleCorners(triangles)
+        closest = closestPointOnTriangle(points[queries], a, b, c)
+        distances = np.sqrt(np.sum((closest - points[queries]) ** 2, axis=1))
+        distances = np.where(np.isnan(distances), np.inf, distances)
+        keep = distances <= maxDistance
+
+        queries, triangles, closest, distances = queries[keep], triangles[keep], closest[keep], distances[keep]
+        order = np.lexsort((distances, queries))
+        queries, triangles, closest, distances = queries[order], triangles[order], closest[order], distances[order]
+        first = np.ones(len(queries), dtype=bool)
+        first[1:] = queries[1:] != queries[:-1]
+
+        nearestDistances = np.full(len(points), np.inf, dtype=np.float32)
+        nearestTriangles = np.full(len(points), -1, dtype=np.int64)
+        nearestPoints = np.full((len(points), 3), np.nan, dtype=np.float32)
+        nearestDistances[queries[first]] = distances[first]
+        nearestTriangles[queries[first]] = self.triangleIDs[triangles[first]]
+        nearestPoints[queries[first]] = closest[first]
+
+        return NearestPoints(nearestDistances, nearestTriangles, nearestPoints)
@@ -0,0 +1,387 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+import numpy as np
+
+from .PolygonGroup import PolygonGroup, PrimitiveTypes, buildPolygonGroupArchive
+from .Weld import weldVertices
+
+# LOD triangle counts relative to the source group
+DEFAULT_LOD_RATIOS = (0.5, 0.25, 0.125)
+# Independent set rounds per batch of collapses
+SELECTION_ROUNDS = 16
+# Candidate collapses looked at per batch, as a multiple of the collapses still
+# needed with a floor so the last few batches have some to choose from
+CANDIDATE_FACTOR = 4
+MIN_CANDIDATES = 1024
+# Smallest cosine of the angle a face may turn by in one collapse
+MIN_FACE_TURN_COS = 0.25
+# Error buckets collapses are picked from in random order
+PRIORITY_BUCKETS = 8
+# Weight of the planes keeping seams in place, relative to the surface
+SEAM_WEIGHT = 10.0
+
+'''
+Quadrics
+
+Garland and Heckbert's "Surface Simplification Using Quadric Error Metrics"
+(1997). A quadric is stored as its 10 distinct coefficients followed by the
+area it was accumulated over:
+(aa, ab, ac, ad, bb, bc, bd, cc, cd, dd, area) for the plane ax + by + cz + d = 0
+Quadrics of many vertices are one coefficient per row so gathering a row stays contiguous.
+'''
+QUADRIC_SIZE = 11
+
+# Area weighted plane quadric of every face
+def getFaceQuadrics(positions, faces):
+    corners = positions[faces]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    areas = lengths * 0.5
+    normals /= np.where(lengths > 0, lengths, 1.0)[:, np.newaxis]
+    a, b, c = normals.T
+    d = -np.einsum("ij,ij->i", normals, corners[:, 0])
+
+    return np.stack((
+        a * a, a * b, a * c, a * d, b * b, b * c, b * d, c * c, c * d, d * d, np.ones_like(a)
+    )) * areas
+
+# Sum of the quadrics of every face around each position
+def getPositionQuadrics(positions, positionFaces):
+    faceQuadrics = getFaceQuadrics(positions.T, positionFaces)
+    corners = positionFaces.ravel()
+    positionCount = positions.shape[1]
+
+    quadrics = np.empty((QUADRIC_SIZE, positionCount))
+    for coefficient in range(QUADRIC_SIZE):
+        quadrics[coefficient] = np.bincount(
+            corners, weights=np.repeat(faceQuadrics[coefficient], 3), minlength=positionCount
+        )
+
+    return quadrics
+
+# Area weighted sum of squared distances of points from the planes of the quadrics
+def getQuadricCosts(quadrics, points):
+    x, y, z = points
+    q = quadrics
+    return (
+        q[0] * x * x + q[4] * y * y + q[7] * z * z + q[9]
+        + 2.0 * (q[1] * x * y + q[2] * x * z + q[5] * y * z + q[3] * x + q[6] * y + q[8] * z)
+    )
+
+# RMS distance from costs and the area they were summed over
+def getQuadricErrors(costs, areas):
+    return np.sqrt(np.maximum(costs, 0.0) / np.maximum(areas, 1e-30))
+
+'''
+Decimation
+
+Decimation works on positions, vertices split for UVs or normals are copies
+of the same position. A position collapses onto a neighbouring one by moving
+every copy onto the copy of the neighbour next to it, so seams collapse along
+themselves and keep their attributes on both sides. Copies with no such
+neighbour (corners of flat shaded faces) keep their attributes and just move,
+seam quadrics keep that from pulling seams across the surface.
+'''
+# Positions that must not move: ones on an edge without exactly two faces (the mesh border)
+def getLockedPositions(positionFaces, positionCount):
+    edges = np.sort(positionFaces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1).astype(np.int64)
+    edgeKeys, edgeCounts = np.unique(edges[:, 0] * positionCount + edges[:, 1], return_counts=True)
+    openEdges = edgeKeys[edgeCounts != 2]
+
+    locked = np.zeros(positionCount, dtype=bool)
+    locked[openEdges // positionCount] = True
+    locked[openEdges % positionCount] = True
+
+    return locked
+
+# Quadrics of planes through every seam edge at right angles to the faces
+# beside it, so moving a seam position off the seam costs more than moving it
+# along. They add no area, seams shouldn't water down the surface error.
+def getSeamQuadrics(positions, faces, vertexMap):
+    positionCount = positions.shape[1]
+    edges = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    positionEdges = vertexMap[edges]
+    swapped = positionEdges[:, 0] > positionEdges[:, 1]
+    edges[swapped] = edges[swapped, ::-1]
+    positionEdges[swapped] = positionEdges[swapped, ::-1]
+
+    # An edge is a seam when the two faces beside it use different copies of its positions
+    keys = positionEdges[:, 0].astype(np.int64) * positionCount + positionEdges[:, 1]
+    order = np.argsort(keys, kind="stable")
+    _, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    starts = starts[counts == 2]
+    first, second = order[starts], order[starts + 1]
+    seams = (edges[first] != edges[second]).any(axis=1)
+    seamEdges = np.concatenate((first[seams], second[seams]))
+
+    points = positions.T
+    corners = points[vertexMap[faces[seamEdges // 3]]]
+    faceNormals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    start, end = points[positionEdges[seamEdges, 0]], points[positionEdges[seamEdges, 1]]
+    normals = np.cross(end - start, faceNormals)
+    lengths = np.linalg.norm(normals, axis=1)
+    normals /= np.where(lengths > 0, lengths, 1.0)[:, np.newaxis]
+    a, b, c = normals.T
+    d = -np.einsum("ij,ij->i", normals, start)
+    weights = SEAM_WEIGHT * np.einsum("ij,ij->i", end - start, end - start)
+    seamQuadrics = np.stack((
+        a * a, a * b, a * c, a * d, b * b, b * c, b * d, c * c, c * d, d * d, np.zeros_like(a)
+    )) * weights
+
+    quadrics = np.zeros((QUADRIC_SIZE, positionCount))
+    corners = positionEdges[seamEdges].ravel()
+    for coefficient in range(QUADRIC_SIZE - 1):
+        quadrics[coefficient] = np.bincount(
+            corners, weights=np.repeat(seamQuadrics[coefficient], 2), minlength=positionCount
+        )
+
+    return quadrics
+
+# Sorted distinct keys, sorting is faster than np.unique's hashing for these
+def getUniqueKeys(keys):
+    keys = np.sort(keys)
+    return keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+# Every (position, neighbouring position) pair where the first is in mask
+def getCollapseCandidates(positionFaces, positionCount, mask):
+    edges = positionFaces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    edges = np.concatenate((edges, edges[:, ::-1]))
+    edges = edges[mask[edges[:, 0]]].astype(np.int64)
+    pairs = getUniqueKeys(edges[:, 0] * positionCount + edges[:, 1])
+
+    return (pairs // positionCount, pairs % positionCount)
+
+# Where every copy of the sources goes when they collapse onto their targets.
+# A copy next to exactly one copy of its target merges onto it, any other copy
+# keeps its attributes and only moves to the target position. vertexMap is
+# updated for the moved copies.
+def collapseCopies(faces, vertexMap, sources, targets):
+    positionTargets = np.full(int(vertexMap.max()) + 1, -1, dtype=np.int64)
+    positionTargets[sources] = targets
+
+    edges = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    edges = np.concatenate((edges, edges[:, ::-1]))
+    edges = edges[positionTargets[vertexMap[edges[:, 0]]] == vertexMap[edges[:, 1]]].astype(np.int64)
+    vertexCount = len(vertexMap)
+    pairs = getUniqueKeys(edges[:, 0] * vertexCount + edges[:, 1])
+    copies, neighbours = pairs // vertexCount, pairs % vertexCount
+    copies, first, counts = np.unique(copies, return_index=True, return_counts=True)
+    merging = counts == 1
+
+    remap = np.arange(vertexCount, dtype=faces.dtype)
+    remap[copies[merging]] = neighbours[first[merging]]
+    moving = np.flatnonzero(positionTargets[vertexMap] != -1)
+    moving = moving[remap[moving] == moving]
+    vertexMap[moving] = positionTargets[vertexMap[moving]]
+
+    return remap
+
+# Picks collapses so that no face has more than one vertex being moved,
+# sources are distinct and in order of priority. Every round takes the
+# collapses that come first in every face around their source vertex, then
+# drops the ones sharing a face with those, until none are left.
+def selectIndependentCollapses(faces, sources, vertexCount, rounds=SELECTION_ROUNDS):
+    unranked = len(sources)
+    vertexRanks = np.full(vertexCount, unranked, dtype=np.int64)
+    vertexRanks[sources] = np.arange(len(sources))
+
+    selected = np.zeros(vertexCount, dtype=bool)
+    corners = faces
+    for _ in range(rounds):
+        # Faces with a single source still in the running can't hold it back
+        active = vertexRanks != unranked
+        active0, active1, active2 = active[corners[:, 0]], active[corners[:, 1]], active[corners[:, 2]]
+        corners = corners[(active0 & (active1 | active2)) | (active1 & active2)]
+        cornerRanks = vertexRanks[corners]
+        faceRanks = np.minimum(np.minimum(cornerRanks[:, 0], cornerRanks[:, 1]), cornerRanks[:, 2])
+
+        # Sources with a face where another source comes first have to wait
+        waiting = np.zeros(vertexCount, dtype=bool)
+        for corner in range(3):
+            waiting[corners[cornerRanks[:, corner] > faceRanks, corner]] = True
+        picked = active & ~waiting
+        selected |= picked
+
+        # Anything sharing a face with a picked source is out
+        vertexRanks[picked] = unranked
+        pickedFaces = corners[picked[corners[:, 0]] | picked[corners[:, 1]] | picked[corners[:, 2]]]
+        vertexRanks[pickedFaces.ravel()] = unranked
+        if len(corners) == 0:
+            break
+
+    return selected[sources]
+
+def isDegenerateFace(faces):
+    return (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 2] == faces[:, 0])
+
+# Collapses a batch of edges at a time until there are at most targetFaceCount
+# faces or every collapse left would move a surface further than maxError.
+# Collapses move a position onto one of its neighbours, so no new vertices
+# (and attributes) are ever made. No face has more than one position moved by
+# a batch, so the whole batch can be applied at once.
+# Every position keeps its cheapest collapse between batches, only positions
+# next to a collapse have theirs worked out again. Collapses that would flip
+# a face are blocked from then on.
+# Positions are one coordinate per row like quadrics.
+# vertexMap is updated as copies move.
+# Returns the remaining faces and the largest error of an applied collapse.
+def collapseEdges(positions, faces, vertexMap, locked, quadrics, targetFaceCount, maxError):
+    positionCount = positions.shape[1]
+    random = np.random.default_rng(0)
+    bestErrors = np.full(positionCount, np.inf)
+    bestTargets = np.full(positionCount, -1, dtype=np.int64)
+    blockedEdges = np.empty(0, dtype=np.int64)
+    dirty = ~locked
+    positionCosts = getQuadricCosts(quadrics, positions)
+    error = 0.0
+    while len(faces) > targetFaceCount:
+        positionFaces = vertexMap[faces]
+        sources, targets = getCollapseCandidates(positionFaces, positionCount, dirty)
+
+        # A collapse's cost is both quadrics at the target, the target's own part is per position
+        errors = getQuadricErrors(
+            getQuadricCosts(quadrics[:, sources], positions[:, targets]) + positionCosts[targets],
+            quadrics[10, sources] + quadrics[10, targets]
+        )
+        valid = errors <= maxError
+        if len(blockedEdges):
+            valid &= ~np.isin(sources * positionCount + targets, blockedEdges)
+        sources, targets, errors = sources[valid], targets[valid], errors[valid]
+
+        bestErrors[dirty] = np.inf
+        bestTargets[dirty] = -1
+        np.minimum.at(bestErrors, sources, errors)
+        # One of them when there are several as cheap
+        cheapest = errors == bestErrors[sources]
+        bestTargets[sources[cheapest]] = targets[cheapest]
+
+        # Each collapse removes the two faces around its edge, only the cheapest few
+        # times as many as needed are looked at so a batch doesn't take expensive
+        # ones over cheap ones
+        sources = np.flatnonzero(bestTargets != -1)
+        if len(sources) == 0:
+            break
+        collapseCount = (len(faces) - targetFaceCount + 1) // 2
+        candidateCount = max(CANDIDATE_FACTOR * collapseCount, MIN_CANDIDATES)
+        sources = sources[np.argsort(bestErrors[sources], kind="stable")][:candidateCount]
+
+        # Errors vary smoothly over a surface so neighbours would keep holding each
+        # other back, collapses are picked in random order within error buckets
+        buckets = np.arange(len(sources)) * PRIORITY_BUCKETS // len(sources)
+        priorities = np.lexsort((random.random(len(sources)), buckets))
+        selected = np.sort(priorities[selectIndependentCollapses(positionFaces, sources[priorities], positionCount)])
+        sources = sources[selected]
+        targets = bestTargets[sources]
+
+        # Drop collapses that would flip a face or turn it too far, small turns can still add up
+        remap = np.arange(positionCount)
+        remap[sources] = targets
+        collapsedFaces = remap[positionFaces]
+        moved = np.flatnonzero((collapsedFaces != positionFaces).any(axis=1))
+        moved = moved[~isDegenerateFace(collapsedFaces[moved])]
+        before = positions.T[positionFaces[moved]]
+        after = positions.T[collapsedFaces[moved]]
+        normalsBefore = np.cross(before[:, 1] - before[:, 0], before[:, 2] - before[:, 0])
+        normalsAfter = np.cross(after[:, 1] - after[:, 0], after[:, 2] - after[:, 0])
+        turns = np.einsum("ij,ij->i", normalsBefore, normalsAfter)
+        lengths = np.linalg.norm(normalsBefore, axis=1) * np.linalg.norm(normalsAfter, axis=1)
+        flippedFaces = positionFaces[moved[turns <= MIN_FACE_TURN_COS * lengths]]
+
+        dirty = np.zeros(positionCount, dtype=bool)
+        rejected = np.zeros(positionCount, dtype=bool)
+        rejected[flippedFaces[remap[flippedFaces] != flippedFaces]] = True
+        blocked = rejected[sources]
+        blockedEdges = np.concatenate((blockedEdges, sources[blocked] * positionCount + targets[blocked]))
+        dirty[sources[blocked]] = True
+
+        # Cheapest of the rest, sources are still in order of error
+        sources = sources[~blocked][:collapseCount]
+        targets = bestTargets[sources]
+        collapsedFaces = collapseCopies(faces, vertexMap, sources, targets)[faces]
+
+        if len(sources):
+            error = max(error, float(bestErrors[sources].max()))
+        # Collapses can share a target
+        np.add.at(quadrics.T, targets, quadrics[:, sources].T)
+        positionCosts[targets] = getQuadricCosts(quadrics[:, targets], positions[:, targets])
+        faces = collapsedFaces[~isDegenerateFace(vertexMap[collapsedFaces])]
+
+        # Collapsed positions are gone, targets and everything around them changed
+        bestErrors[sources] = np.inf
+        bestTargets[sources] = -1
+        collapsed = np.zeros(positionCount, dtype=bool)
+        collapsed[sources] = True
+        hasTarget = np.flatnonzero(bestTargets != -1)
+        dirty[hasTarget[collapsed[bestTargets[hasTarget]]]] = True
+        changed = np.zeros(positionCount, dtype=bool)
+        changed[targets] = True
+        positionFaces = vertexMap[faces]
+        dirty[positionFaces[changed[positionFaces[:, 0]] | changed[positionFaces[:, 1]] | changed[positionFaces[:, 2]]].ravel()] = True
+        dirty &= ~locked
+
+    return (faces, error)
+
+class DecimateResult:
+    def __init__(self, group, error):
+        self.group = group
+        # Largest quadric error (a distance in model units) of any collapse made
+        self.error = error
+
+# Group made of the vertices the faces still use, in their original order.
+# Copies that moved take the position they moved to.
+def buildDecimatedGroup(group, faces, vertexMap, positions):
+    usedVertices, localIndices = np.unique(faces, return_inverse=True)
+    vertexData = group.vertexData[usedVertices]
+    vertexData["VERTEX"] = positions[:, vertexMap[usedVertices]].T
+    return PolygonGroup(buildPolygonGroupArchive(
+        group.id, group.vertexFormat, vertexData,
+        None, localIndices.ravel(), PrimitiveTypes.TRIANGLELIST,
+        group.cubeTextureCoordCount, group.packing
+    ))
+
+# Decimates a group down to each of the face counts in turn, every level
+# carries on from the one before. Attributes are kept as vertices are only
+# ever removed or moved, borders never move.
+# Strips come out as triangle lists.
+def decimateToFaceCounts(group, faceCounts, maxError=np.inf):
+    if group.primitiveType == PrimitiveTypes.LINELIST or len(group.getTriangles()) == 0:
+        return [DecimateResult(group, 0.0) for _ in faceCounts]
+
+    faces = group.getTriangles().astype(np.int32)
+    weld = weldVertices(group)
+    vertexMap = weld.vertexMap.copy()
+    positions = np.ascontiguousarray(group.vertices[weld.representatives].T, dtype=np.float64)
+    positionFaces = vertexMap[faces]
+    locked = getLockedPositions(positionFaces, positions.shape[1])
+    quadrics = getPositionQuadrics(positions, positionFaces) + getSeamQuadrics(positions, faces, vertexMap)
+
+    results = []
+    error = 0.0
+    for level, faceCount in enumerate(faceCounts):
+        faces, levelError = collapseEdges(positions, faces, vertexMap, locked, quadrics, faceCount, maxError)
+        error = max(error, levelError)
+        if len(faces) > faceCount:
+            print(
+                f"Warning: LOD {level + 1} of polygon group {int.from_bytes(group.id, 'little')}"
+                f" stopped at {len(faces)} triangles, target was {faceCount}"
+            )
+        results.append(DecimateResult(buildDecimatedGroup(group, faces, vertexMap, positions), error))
+
+    return results
+
+def decimatePolygonGroup(group, targetFaceCount, maxError=np.inf):
+    return decimateToFaceCounts(group, (targetFaceCount,), maxError)[0]
+
+# LOD groups with the given fractions of the group's triangles, with a
+# maxError the LODs stop short of their target when collapses get too costly
+def generateLODs(group, ratios=DEFAULT_LOD_RATIOS, maxError=np.inf):
+    faceCount = len(group.getTriangles())
+    return decimateToFaceCounts(group, [int(faceCount * ratio) for ratio in ratios], maxError)
@@ -0,0 +1,153 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+from collections import deque
+
+import numpy as np
+
+from .PolygonGroup import PolygonGroup, PrimitiveTypes, buildPolygonGroupArchive
+
+DEFAULT_CACHE_SIZE = 16
+
+'''
+Metrics
+'''
+# Average cache miss ratio: vertex shader runs per triangle with a FIFO post-transform cache
+def getACMR(faces, cacheSize=DEFAULT_CACHE_SIZE):
+    if len(faces) == 0:
+        return 0.0
+
+    cache = deque()
+    cached = set()
+    misses = 0
+    for vertex in np.asarray(faces).ravel().tolist():
+        if vertex in cached:
+            continue
+        misses += 1
+        cache.append(vertex)
+        cached.add(vertex)
+        if len(cache) > cacheSize:
+            cached.discard(cache.popleft())
+
+    return misses / len(faces)
+
+'''
+Optimizers
+'''
+# Reorders triangles for the post-transform vertex cache, this is Tipsify from
+# "Fast Triangle Reordering for Vertex Locality and Reduced Overdraw" (Sander et al. 2007)
+def optimizeVertexCache(faces, vertexCount, cacheSize=DEFAULT_CACHE_SIZE):
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    faceCount = len(faces)
+    if faceCount == 0:
+        return faces
+
+    # Vertex to triangle adjacency, CSR style
+    corners = faces.ravel()
+    order = np.argsort(corners, kind="stable")
+    adjacentFaces = (order // 3).tolist()
+    adjacencyStart = np.zeros(vertexCount + 1, dtype=np.int64)
+    np.cumsum(np.bincount(corners, minlength=vertexCount), out=adjacencyStart[1:])
+    adjacencyStart = adjacencyStart.tolist()
+
+    faceList = faces.tolist()
+    liveCounts = np.bincount(corners, minlength=vertexCount).tolist()
+    cacheTimes = [0] * vertexCount
+    emitted = [False] * faceCount
+    deadEnds = []
+    output = []
+
+    timestamp = cacheSize + 1
+    cursor = 0
+    fanning = 0
+    while fanning >= 0:
+        candidates = []
+        for face in adjacentFaces[adjacencyStart[fanning]:adjacencyStart[fanning + 1]]:
+            if emitted[face]:
+                continue
+            emitted[face] = True
+            output.append(face)
+            for vertex in faceList[face]:
+                deadEnds.append(vertex)
+                candidates.append(vertex)
+                liveCounts[vertex] -= 1
+                if timestamp - cacheTimes[vertex] > cacheSize:
+                    cacheTimes[vertex] = timestamp
+                    timestamp += 1
+
+        # Next fanning vertex, prefer ones that stay in the cache whilst their triangles are emitted
+        fanning = -1
+        bestPriority = -1
+        for vertex in candidates:
+            if liveCounts[vertex] <= 0:
+                continue
+            priority = 0
+            if timestamp - cacheTimes[vertex] + 2 * liveCounts[vertex] <= cacheSize:
+                priority = timestamp - cacheTimes[vertex]
+            if priority > bestPriority:
+                bestPriority = priority
+                fanning = vertex
+
+        if fanning == -1:
+            # Dead end, go back to a recently used vertex or the next vertex with triangles left
+            while deadEnds:
+                vertex = deadEnds.pop()
+                if liveCounts[vertex] > 0:
+                    fanning = vertex
+                    break
+            while fanning == -1 and cursor < vertexCount:
+                if liveCounts[cursor] > 0:
+                    fanning = cursor
+                cursor += 1
+
+    return faces[np.array(output, dtype=np.int64)]
+
+# Renumbers vertices in the order they're first used by faces so
+# vertex fetches run through memory linearly, unused vertices are dropped.
+# Returns the new faces and the old index of every new vertex.
+def optimizeVertexFetch(faces):
+    faces = np.asarray(faces)
+    usedVertices, firstUse, inverse = np.unique(faces.ravel(), return_index=True, return_inverse=True)
+    order = np.argsort(firstUse, kind="stable")
+
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+
+    return (remap[inverse.ravel()].reshape(faces.shape), usedVertices[order])
+
+class OptimizeResult:
+    def __init__(self, group, acmrBefore, acmrAfter):
+        self.group = group
+        self.acmrBefore = acmrBefore
+        self.acmrAfter = acmrAfter
+
+# Rewrites a group's indices and vertex buffer for the vertex cache and
+# vertex fetch, geometry stays the same. Strips come out as triangle lists.
+def optimizePolygonGroup(group, cacheSize=DEFAULT_CACHE_SIZE):
+    if group.primitiveType == PrimitiveTypes.LINELIST:
+        return OptimizeResult(group, 0.0, 0.0)
+
+    if group.primitiveType == PrimitiveTypes.TRIANGLESTRIP:
+        faces = group.getTriangleStrip()
+    else:
+        faces = group.getTriangleList()
+    acmrBefore = getACMR(faces, cacheSize)
+
+    faces = optimizeVertexCache(faces, len(group.vertexData), cacheSize)
+    faces, vertexOrder = optimizeVertexFetch(faces)
+    acmrAfter = getACMR(faces, cacheSize)
+
+    optimized = PolygonGroup(buildPolygonGroupArchive(
+        group.id, group.vertexFormat, group.vertexData[vertexOrder],
+        None, faces.ravel(), PrimitiveTypes.TRIANGLELIST,
+        group.cubeTextureCoordCount, group.packing
+    ))
+
+    return OptimizeResult(optimized, acmrBefore, acmrAfter)
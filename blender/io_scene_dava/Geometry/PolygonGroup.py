@@ -8,9 +8,9 @@ The above copyright notice and this permission notice shall be included in all c
 THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
-from io import BytesIO
+import numpy as np
 
-from ..FileIO.StreamBuffer import StreamBuffer
+from ..FileIO.KA import KeyedArchive
 
 class VertexTypes:
     VERTEX = 1
@@ -33,144 +33,210 @@ class VertexTypes:
     CUBETEXCOORD2 = 1 << 18
     CUBETEXCOORD3 = 1 << 19
 
+# Interleaved layout of each vertex attribute, in the order DAVA writes them
+# (attribute, numpy component type, component count)
+VertexAttributes = (
+    ("VERTEX", "<f4", 3),
+    ("NORMAL", "<f4", 3),
+    ("COLOR", "u1", 4), # Packed RGBA
+    ("TEXCOORD0", "<f4", 2),
+    ("TEXCOORD1", "<f4", 2),
+    ("TEXCOORD2", "<f4", 2),
+    ("TEXCOORD3", "<f4", 2),
+    ("TANGENT", "<f4", 3),
+    ("BINORMAL", "<f4", 3),
+    ("HARD_JOINTINDEX", "<f4", 1),
+    ("CUBETEXCOORD0", "<f4", 3),
+    ("CUBETEXCOORD1", "<f4", 3),
+    ("CUBETEXCOORD2", "<f4", 3),
+    ("CUBETEXCOORD3", "<f4", 3),
+    ("PIVOT4", "<f4", 4),
+    ("FLEXIBILITY", "<f4", 1),
+    ("ANGLE_SIN_COS", "<f4", 2),
+    ("JOINTINDEX", "<f4", 4),
+    ("JOINTWEIGHT", "<f4", 4),
+)
+
 class VertexFormat:
     def __init__(self, fmt):
-        # Stride values
-        self.stride = 0
-        self.VERTX = -1
-        self.NORMAL = -1
-        self.COLOR = -1
-        self.TEXCOORD0 = -1
-        self.TEXCOORD1 = -1
-        self.TEXCOORD2 = -1
-        self.TEXCOORD3 = -1
-        self.TANGENT = -1
-        self.BINORMAL = -1
-        self.HARD_JOINTINDEX = -1
-        self.CUBETEXCOORD0 = -1
-        self.CUBETEXCOORD1 = -1
-        self.CUBETEXCOORD2 = -1
-        self.CUBETEXCOORD3 = -1
-        self.PIVOT4 = -1
-        self.FLEXIBILITY = -1
-        self.ANGLE_SIN_COS = -1
-        self.JOINTINDEX = -1
-        self.JOINTWEIGHT = -1
-
-        # Parse format
+        self.format = fmt
+
+        # Parse format, each attribute gets its offset into the vertex or -1 if it isn't present
         stride = 0
-        if (fmt & VertexTypes.VERTEX):
-            self.VERTEX = stride
-            stride += 3 * 4
-        if (fmt & VertexTypes.NORMAL):
-            self.NORMAL = stride
-            stride += 3 * 4
-        if (fmt & VertexTypes.COLOR):
-            self.COLOR = stride
-            stride += 4
-        if (fmt & VertexTypes.TEXCOORD0):
-            self.TEXCOORD0 = stride
-            stride += 2 * 4
-        if (fmt & VertexTypes.TEXCOORD1):
-            self.TEXCOORD1 = stride
-            stride += 2 * 4
-        if (fmt & VertexTypes.TEXCOORD2):
-            self.TEXCOORD2 = stride
-            stride += 2 * 4
-        if (fmt & VertexTypes.TEXCOORD3):
-            self.TEXCOORD3 = stride
-            stride += 2 * 4
-
-        if (fmt & VertexTypes.TANGENT):
-            self.TANGENT = stride
-            stride += 3 * 4
-        if (fmt & VertexTypes.BINORMAL):
-            self.BINORMAL = stride
-            stride += 3 * 4
-        if (fmt & VertexTypes.HARD_JOINTINDEX):
-            self.HARD_JOINTINDEX = stride
-            stride += 4
-
-        if (fmt & VertexTypes.CUBETEXCOORD0):
-            self.CUBETEXCOORD0 = stride
-            stride += 3 * 4
-        if (fmt & VertexTypes.CUBETEXCOORD1):
-            self.CUBETEXCOORD1 = stride
-            stride += 3 * 4
-        if (fmt & VertexTypes.CUBETEXCOORD2):
-            self.CUBETEXCOORD2 = stride
-            stride += 3 * 4
-        if (fmt & VertexTypes.CUBETEXCOORD3):
-            self.CUBETEXCOORD3 = stride
-            stride += 3 * 4
-
-        if (fmt & VertexTypes.PIVOT4):
-            self.PIVOT4 = stride
-            stride += 4 * 4
-        if (fmt & VertexTypes.FLEXIBILITY):
-            self.FLEXIBILITY = stride
-            stride += 4
-        if (fmt & VertexTypes.ANGLE_SIN_COS):
-            self.ANGLE_SIN_COS = stride
-            stride += 2 * 4
-
-        if (fmt & VertexTypes.JOINTINDEX):
-            self.JOINTINDEX = stride
-            stride += 4 * 4
-        if (fmt & VertexTypes.JOINTWEIGHT):
-            self.JOINTWEIGHT = stride
-            stride += 4 * 4
+        names = []
+        formats = []
+        offsets = []
+        for attribute, componentType, componentCount in VertexAttributes:
+            if not (fmt & getattr(VertexTypes, attribute)):
+                setattr(self, attribute, -1)
+                continue
+
+            setattr(self, attribute, stride)
+            names.append(attribute)
+            formats.append(
+                componentType if componentCount == 1 else (componentType, (componentCount,))
+            )
+            offsets.append(stride)
+            stride += np.dtype(componentType).itemsize * componentCount
 
         self.stride = stride
+        self.attributes = names
+
+        # Structured dtype describing one interleaved vertex
+        self.dtype = np.dtype({
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": stride
+        })
+
+class IndexTypes:
+    UINT16 = 0
+    UINT32 = 1
+
+    DTYPES = {
+        UINT16: np.dtype("<u2"),
+        UINT32: np.dtype("<u4")
+    }
+
+    # Vertices addressable by 16 bit indices
+    UINT16_LIMIT = 0x10000
+
+# Smallest index format that can address every vertex
+def getIndexFormat(vertexCount):
+    if vertexCount <= IndexTypes.UINT16_LIMIT:
+        return IndexTypes.UINT16
+    return IndexTypes.UINT32
 
 class PrimitiveTypes:
     TRIANGLELIST = 1
     TRIANGLESTRIP = 2
     LINELIST = 10
 
+# Mask of triangles that reference the same vertex more than once
+def isDegenerate(faces):
+    return (
+        (faces[:, 0] == faces[:, 1]) |
+        (faces[:, 1] == faces[:, 2]) |
+        (faces[:, 0] == faces[:, 2])
+    )
+
+# Axis aligned bounding box (min, max) of points, None when there are none
+def getBounds(points):
+    if len(points) == 0:
+        return None
+    return (points.min(axis=0), points.max(axis=0))
+
+def getPrimitiveCount(primitiveType, indexCount):
+    match primitiveType:
+        case PrimitiveTypes.TRIANGLELIST:
+            return indexCount // 3
+        case PrimitiveTypes.TRIANGLESTRIP:
+            return max(indexCount - 2, 0)
+        case PrimitiveTypes.LINELIST:
+            return indexCount // 2
+
+# Keyed archive of a polygon group as it's stored in SCG files,
+# an indexFormat of None picks the smallest one that fits
+def buildPolygonGroupArchive(groupID, vertexFormat, vertexData, indexFormat, indices, primitiveType, cubeTextureCoordCount=0, packing=0):
+    if isinstance(groupID, int):
+        groupID = groupID.to_bytes(8, "little")
+    if indexFormat is None:
+        indexFormat = getIndexFormat(len(vertexData))
+    indices = np.ascontiguousarray(indices, dtype=IndexTypes.DTYPES[indexFormat])
+    textureCoordCount = sum(
+        attribute.startswith("TEXCOORD") for attribute in vertexFormat.attributes
+    )
+
+    return KeyedArchive(
+        (
+            "##name", "#id", "cubeTextureCoordCount", "indexCount", "indexFormat", "indices", "packing",
+            "primitiveCount", "rhi_primitiveType", "textureCoordCount", "vertexCount", "vertexFormat", "vertices"
+        ),
+        (
+            "PolygonGroup", groupID, cubeTextureCoordCount, len(indices), indexFormat, indices, packing,
+            getPrimitiveCount(primitiveType, len(indices)), primitiveType, textureCoordCount, len(vertexData), vertexFormat.format, vertexData
+        )
+    )
+
 class PolygonGroup:
+    # Packs separate attribute arrays, e.g. {"VERTEX": positions, "NORMAL": normals},
+    # into the interleaved layout of the matching vertex format
+    @classmethod
+    def fromArrays(self, groupID, attributes, indices, primitiveType=PrimitiveTypes.TRIANGLELIST, indexFormat=None, cubeTextureCoordCount=0):
+        fmt = 0
+        for attribute in attributes:
+            fmt |= getattr(VertexTypes, attribute)
+        vertexFormat = VertexFormat(fmt)
+
+        vertexData = np.zeros(len(attributes["VERTEX"]), dtype=vertexFormat.dtype)
+        for attribute, values in attributes.items():
+            vertexData[attribute] = values
+
+        return self(buildPolygonGroupArchive(
+            groupID, vertexFormat, vertexData, indexFormat, indices, primitiveType, cubeTextureCoordCount
+        ))
+
     def __init__(self, polyGroup):
         self.id = polyGroup["#id"]
         self.cubeTextureCoordCount = polyGroup["cubeTextureCoordCount"]
         self.primitiveType = polyGroup["rhi_primitiveType"]
         self.primitiveCount = polyGroup["primitiveCount"]
-
-        # Vertices
-        self.vertices = []
-        self.normals = []
-        self.colors = []
-        self.texcoords = []
-        self.tangents = []
-        self.binormals = []
-        self.hard_jointindices = []
-        self.pivot4 = []
-        self.flexibilities = []
-        self.angles_sin_cos = []
-        self.jointindices = []
-        self.jointweights = []
-        self.cubetexcoords = []
+        self.packing = polyGroup.get("packing", 0)
 
         # Parse vertex format
-        vertexFormat = VertexFormat(polyGroup["vertexFormat"])
+        self.vertexFormat = VertexFormat(polyGroup["vertexFormat"])
 
-        # Parse vertices TODO
-        stream = StreamBuffer( BytesIO(polyGroup["vertices"]) )
-        for _ in range(polyGroup["vertexCount"]):
-            if vertexFormat.VERTEX > -1:
-                self.vertices.append(
-                        (stream.readFloat(), stream.readFloat(), stream.readFloat())
-                )
-            stream.readBytes(vertexFormat.stride - 12) # Read off unhandled data
+        # Parse vertices, the whole buffer is decoded in one go and every
+        # attribute below is a view into it
+        self.vertexData = np.frombuffer(
+            polyGroup["vertices"],
+            dtype=self.vertexFormat.dtype,
+            count=polyGroup["vertexCount"]
+        )
+        self.vertices = self.getAttribute("VERTEX")
+        self.normals = self.getAttribute("NORMAL")
+        self.colors = self.getAttribute("COLOR")
+        self.texcoords = self.getAttributes("TEXCOORD0", "TEXCOORD1", "TEXCOORD2", "TEXCOORD3")
+        self.tangents = self.getAttribute("TANGENT")
+        self.binormals = self.getAttribute("BINORMAL")
+        self.hard_jointindices = self.getAttribute("HARD_JOINTINDEX")
+        self.pivot4 = self.getAttribute("PIVOT4")
+        self.flexibilities = self.getAttribute("FLEXIBILITY")
+        self.angles_sin_cos = self.getAttribute("ANGLE_SIN_COS")
+        self.jointindices = self.getAttribute("JOINTINDEX")
+        self.jointweights = self.getAttribute("JOINTWEIGHT")
+        self.cubetexcoords = self.getAttributes("CUBETEXCOORD0", "CUBETEXCOORD1", "CUBETEXCOORD2", "CUBETEXCOORD3")
+        self.bounds = getBounds(self.vertices)
 
         # Parse indices
-        # 0 = uint16_t
-        # 1 = uint32_t
-        stream = StreamBuffer( BytesIO(polyGroup["indices"]) )
-        self.indices = []
-        if polyGroup["indexFormat"] == 0:
-            for _ in range(polyGroup["indexCount"]): self.indices.append( stream.readInt16(False) )
-        if polyGroup["indexFormat"] == 1:
-            for _ in range(polyGroup["indexCount"]): self.indices.append( stream.readInt32(False) )
+        self.indexFormat = polyGroup["indexFormat"]
+        self.indices = np.frombuffer(
+            polyGroup["indices"],
+            dtype=IndexTypes.DTYPES[self.indexFormat],
+            count=polyGroup["indexCount"]
+        )
+
+    def toArchive(self):
+        return buildPolygonGroupArchive(
+            self.id, self.vertexFormat, self.vertexData, self.indexFormat, self.indices,
+            self.primitiveType, self.cubeTextureCoordCount, self.packing
+        )
+
+    '''
+    Vertex attributes
+    '''
+    # Returns a view of the attribute or None if the vertex format doesn't have it
+    def getAttribute(self, attribute):
+        if attribute not in self.vertexFormat.attributes:
+            return None
+        return self.vertexData[attribute]
+
+    # Views of every present attribute out of the given ones, e.g. all texture coordinate sets
+    def getAttributes(self, *attributes):
+        return [
+            self.vertexData[attribute] for attribute in attributes if attribute in self.vertexFormat.attributes
+        ]
 
     '''
     Primitive builders
@@ -178,43 +244,28 @@ class PolygonGroup:
     line list, triangle list, triangle strip
     '''
     def getTriangleList(self):
-        faceIndices = []
-        for i in range(0, len(self.indices), 3):
-            faceIndices.append([
-                self.indices[i],
-                self.indices[i+1],
-                self.indices[i+2]
-            ])
+        count = len(self.indices) - len(self.indices) % 3
+        return self.indices[:count].reshape(-1, 3)
 
-        return faceIndices
+    # Triangles of either triangle primitive type
+    def getTriangles(self):
+        if self.primitiveType == PrimitiveTypes.TRIANGLESTRIP:
+            return self.getTriangleStrip()
+        return self.getTriangleList()
 
     #NOTE: We convert trianglestrip to trianglist to make the import easier
-    def getTriangleStrip(self): 
-        faceIndices = []
-
-        # First triangle
-        faceIndices.append([
-            self.indices[0],
-            self.indices[1],
-            self.indices[2]
-        ])
-
-        # Digest triangestrip into trianglelist
-        for i in range(3, len(self.indices)):
-            faceIndices.append([
-                self.indices[i-2],
-                self.indices[i-1],
-                self.indices[i]
-            ])
-
-        return faceIndices
+    def getTriangleStrip(self):
+        if len(self.indices) < 3:
+            return np.empty((0, 3), dtype=self.indices.dtype)
+
+        # Triangle i is made of strip indices i, i+1, i+2, every odd
+        # triangle has its first two indices swapped to keep the winding
+        faceIndices = np.lib.stride_tricks.sliding_window_view(self.indices, 3).copy()
+        faceIndices[1::2, [0, 1]] = faceIndices[1::2, [1, 0]]
+
+        # Drop the degenerate triangles used to stitch strips together
+        return faceIndices[~isDegenerate(faceIndices)]
 
     def getLineList(self):
-        edgeIndices = []
-        for i in range(0, len(self.indices), 2):
-            edgeIndices.append([
-                self.indices[i],
-                self.indices[i+1]
-            ])
-
-        return edgeIndices
+        count = len(self.indices) - len(self.indices) % 2
+        return self.indices[:count].reshape(-1, 2)
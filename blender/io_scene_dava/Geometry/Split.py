@@ -0,0 +1,72 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+import numpy as np
+
+from .PolygonGroup import PolygonGroup, PrimitiveTypes, IndexTypes, buildPolygonGroupArchive, getIndexFormat
+
+# Same group with the smallest index format that fits, groups that
+# are already as small as they can be are returned as is
+def compactIndices(group):
+    if group.indexFormat == getIndexFormat(len(group.vertexData)):
+        return group
+
+    return PolygonGroup(buildPolygonGroupArchive(
+        group.id, group.vertexFormat, group.vertexData,
+        None, group.indices, group.primitiveType,
+        group.cubeTextureCoordCount, group.packing
+    ))
+
+# Number of primitives from the start of primitives that reference at most maxVertices distinct vertices
+def getChunkLength(primitives, maxVertices):
+    corners = primitives.ravel()
+    _, firstUse = np.unique(corners, return_index=True)
+    isNew = np.zeros(len(corners), dtype=bool)
+    isNew[firstUse] = True
+
+    # Distinct vertex count once each primitive is added
+    vertexCounts = np.cumsum(isNew).reshape(primitives.shape)[:, -1]
+    return int(np.searchsorted(vertexCounts, maxVertices, side="right"))
+
+# Splits a group into groups of at most maxVertices vertices each so every
+# one of them can use 16 bit indices. Primitives keep their order, each
+# sub-group only gets the vertices it uses and indices local to those.
+# Sub-groups keep the original group ID, strips come out as triangle lists.
+def splitPolygonGroup(group, maxVertices=IndexTypes.UINT16_LIMIT):
+    if len(group.vertexData) <= maxVertices:
+        return [compactIndices(group)]
+
+    match group.primitiveType:
+        case PrimitiveTypes.LINELIST:
+            primitives = group.getLineList()
+            primitiveType = PrimitiveTypes.LINELIST
+        case PrimitiveTypes.TRIANGLESTRIP:
+            primitives = group.getTriangleStrip()
+            primitiveType = PrimitiveTypes.TRIANGLELIST
+        case _:
+            primitives = group.getTriangleList()
+            primitiveType = PrimitiveTypes.TRIANGLELIST
+
+    groups = []
+    start = 0
+    while start < len(primitives):
+        # Meshes have around twice as many triangles as vertices, only look that far ahead
+        window = primitives[start:start + 4 * maxVertices]
+        end = start + max(getChunkLength(window, maxVertices), 1)
+
+        usedVertices, localIndices = np.unique(primitives[start:end], return_inverse=True)
+        groups.append(PolygonGroup(buildPolygonGroupArchive(
+            group.id, group.vertexFormat, group.vertexData[usedVertices],
+            None, localIndices.ravel(), primitiveType,
+            group.cubeTextureCoordCount, group.packing
+        )))
+        start = end
+
+    return groups
@@ -0,0 +1,69 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+import numpy as np
+
+from .PolygonGroup import PolygonGroup, buildPolygonGroupArchive
+
+class WeldResult:
+    def __init__(self, group, vertexMap, representatives):
+        # Welded polygon group
+        self.group = group
+        # Welded vertex index of every original vertex
+        self.vertexMap = vertexMap
+        # Original vertex each welded vertex was taken from
+        self.representatives = representatives
+
+    # Original faces/edges (e.g. from getTriangleList) in terms of welded
+    # vertices, indexing attributes with the original ones still gives per loop values
+    def remap(self, primitives):
+        return self.vertexMap[primitives]
+
+# Rounds values onto a grid of the given size, 0 keeps them exact
+def quantize(values, tolerance):
+    values = np.asarray(values).reshape(len(values), -1)
+    if tolerance > 0:
+        return np.floor(values / tolerance + 0.5).astype(np.int64)
+
+    # Compare exact bit patterns, adding 0 turns -0.0 into 0.0 first
+    if values.dtype.kind == "f":
+        return (values.astype(np.float32) + np.float32(0.0)).view(np.int32).astype(np.int64)
+    return values.astype(np.int64)
+
+# Finds vertices that share a position (snapped to a grid of size
+# tolerance) and optionally the same attribute values (e.g. "NORMAL",
+# "TEXCOORD0") within attributeTolerance. Vertices are grouped by sorting
+# their quantized keys, so this is O(n log n).
+def weldVertices(group, tolerance=0.0, attributes=(), attributeTolerance=1e-4):
+    keys = [quantize(group.vertices, tolerance)]
+    for attribute in attributes:
+        values = group.getAttribute(attribute)
+        if values is not None:
+            keys.append(quantize(values, attributeTolerance))
+    keys = np.ascontiguousarray(np.hstack(keys))
+
+    # One opaque value per row so np.unique sorts whole keys at once
+    rows = keys.view(np.dtype((np.void, keys.dtype.itemsize * keys.shape[1]))).ravel()
+    _, representatives, vertexMap = np.unique(rows, return_index=True, return_inverse=True)
+
+    # Keep welded vertices in the order they first appear
+    order = np.argsort(representatives)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    representatives = representatives[order]
+    vertexMap = rank[vertexMap.ravel()]
+
+    welded = PolygonGroup(buildPolygonGroupArchive(
+        group.id, group.vertexFormat, group.vertexData[representatives],
+        None, vertexMap[group.indices], group.primitiveType,
+        group.cubeTextureCoordCount, group.packing
+    ))
+
+    return WeldResult(welded, vertexMap, representatives)
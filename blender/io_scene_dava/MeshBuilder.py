@@ -0,0 +1,253 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+import bpy
+import numpy as np
+
+from .Geometry.PolygonGroup import PrimitiveTypes, PolygonGroup, isDegenerate
+
+def getFaces(group):
+    if group.primitiveType == PrimitiveTypes.TRIANGLESTRIP:
+        return group.getTriangleStrip()
+    return group.getTriangleList()
+
+# Builds a Blender mesh out of a polygon group, everything goes through
+# foreach_set with flat arrays instead of from_pydata's Python lists.
+# With a WeldResult the welded vertices make up the mesh whilst
+# attributes are still taken per loop from the original vertices.
+# faces can be passed in when getFaces was already called on the group.
+def buildMesh(name, group, weld=None, faces=None):
+    mesh = bpy.data.meshes.new(name)
+
+    topology = group if weld is None else weld.group
+    positions = np.ascontiguousarray(topology.vertices, dtype=np.float32)
+    mesh.vertices.add(len(positions))
+    mesh.vertices.foreach_set("co", positions.ravel())
+
+    if group.primitiveType == PrimitiveTypes.LINELIST:
+        edges = group.getLineList()
+        if weld is not None:
+            edges = weld.remap(edges)
+            edges = edges[edges[:, 0] != edges[:, 1]]
+        mesh.edges.add(len(edges))
+        mesh.edges.foreach_set("vertices", edges.astype(np.int32).ravel())
+        mesh.update()
+        return mesh
+
+    sourceFaces = getFaces(group) if faces is None else faces
+    faces = sourceFaces
+    if weld is not None:
+        faces = weld.remap(sourceFaces)
+        keep = ~isDegenerate(faces)
+        faces = faces[keep]
+        sourceFaces = sourceFaces[keep]
+    loopVertices = faces.astype(np.int32).ravel()
+    sourceLoopVertices = sourceFaces.astype(np.int32).ravel()
+
+    mesh.loops.add(len(loopVertices))
+    mesh.loops.foreach_set("vertex_index", loopVertices)
+    mesh.polygons.add(len(faces))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, len(loopVertices), 3, dtype=np.int32))
+    if bpy.app.version < (4, 0, 0):
+        mesh.polygons.foreach_set("loop_total", np.full(len(faces), 3, dtype=np.int32))
+    mesh.update(calc_edges=True)
+
+    setTexcoords(mesh, group, sourceLoopVertices)
+    setColors(mesh, group, sourceLoopVertices)
+    setNormals(mesh, group, sourceLoopVertices)
+    setGenericAttributes(mesh, group, sourceLoopVertices)
+
+    return mesh
+
+'''
+Attributes
+
+Attributes are set per loop, loopVertices holds the polygon group vertex of every loop
+'''
+def setTexcoords(mesh, group, loopVertices):
+    # Blender's V axis points the other way
+    for i, texcoords in enumerate(group.texcoords):
+        uvs = texcoords[loopVertices]
+        uvs[:, 1] = 1.0 - uvs[:, 1]
+
+        uvLayer = mesh.uv_layers.new(name=f"UVMap{i}" if i else "UVMap")
+        uvLayer.data.foreach_set("uv", uvs.astype(np.float32).ravel())
+
+def setColors(mesh, group, loopVertices):
+    if group.colors is None:
+        return
+
+    colors = mesh.color_attributes.new(name="Color", type="BYTE_COLOR", domain="CORNER")
+    colors.data.foreach_set("color", (group.colors[loopVertices] / 255.0).astype(np.float32).ravel())
+
+def setNormals(mesh, group, loopVertices):
+    if group.normals is None:
+        return
+
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
+    if bpy.app.version < (4, 1, 0):
+        mesh.use_auto_smooth = True
+    mesh.normals_split_custom_set(
+        np.ascontiguousarray(group.normals[loopVertices], dtype=np.float32)
+    )
+
+# Attributes Blender has no dedicated place for
+# (DAVA attribute, Blender attribute name, attribute type, foreach_set property)
+GenericAttributes = (
+    ("TANGENT", "Tangent", "FLOAT_VECTOR", "vector"),
+    ("BINORMAL", "Binormal", "FLOAT_VECTOR", "vector"),
+    ("CUBETEXCOORD0", "CubeTexCoord0", "FLOAT_VECTOR", "vector"),
+    ("CUBETEXCOORD1", "CubeTexCoord1", "FLOAT_VECTOR", "vector"),
+    ("CUBETEXCOORD2", "CubeTexCoord2", "FLOAT_VECTOR", "vector"),
+    ("CUBETEXCOORD3", "CubeTexCoord3", "FLOAT_VECTOR", "vector"),
+    ("PIVOT4", "Pivot", "FLOAT_COLOR", "color"),
+    ("FLEXIBILITY", "Flexibility", "FLOAT", "value"),
+    ("ANGLE_SIN_COS", "AngleSinCos", "FLOAT2", "vector"),
+)
+
+def setGenericAttributes(mesh, group, loopVertices):
+    for attribute, name, attributeType, prop in GenericAttributes:
+        values = group.getAttribute(attribute)
+        if values is None:
+            continue
+
+        meshAttribute = mesh.attributes.new(name=name, type=attributeType, domain="CORNER")
+        meshAttribute.data.foreach_set(
+            prop, np.ascontiguousarray(values[loopVertices], dtype=np.float32).ravel()
+        )
+
+'''
+Skinning
+
+Vertex groups belong to the object, so these are set once the mesh has one
+'''
+# Vertex group name of a joint
+def getJointName(joint):
+    return f"Joint{joint}"
+
+# Joint and weight of every influence as flat arrays, hard skinned
+# meshes have one joint per vertex with a weight of 1
+def getSkinInfluences(group):
+    if group.jointindices is not None and group.jointweights is not None:
+        vertices = np.repeat(np.arange(len(group.vertexData)), 4)
+        joints = group.jointindices.astype(np.int64).ravel()
+        weights = group.jointweights.astype(np.float32).ravel()
+        used = weights > 0
+        return (vertices[used], joints[used], weights[used])
+
+    if group.hard_jointindices is not None:
+        vertices = np.arange(len(group.vertexData))
+        joints = group.hard_jointindices.astype(np.int64)
+        return (vertices, joints, np.ones(len(vertices), dtype=np.float32))
+
+    return None
+
+# Skin weights are rounded to this many steps, like 8 bit weights, so
+# there are few distinct weights per joint
+SKIN_WEIGHT_STEPS = 255
+
+# Vertex group weights can only be set through VertexGroup.add, which takes
+# one weight for many vertices. Influences are sorted by joint and weight
+# so there's one call per distinct (joint, weight) pair instead of per vertex.
+def setSkinWeights(obj, group, weld=None):
+    influences = getSkinInfluences(group)
+    if influences is None:
+        return
+    vertices, joints, weights = influences
+
+    # Welded vertices take the weights of the vertex they were taken from
+    if weld is not None:
+        keep = np.zeros(len(group.vertexData), dtype=bool)
+        keep[weld.representatives] = True
+        keep = keep[vertices]
+        vertices = weld.vertexMap[vertices[keep]]
+        joints = joints[keep]
+        weights = weights[keep]
+
+    if len(vertices) == 0:
+        return
+
+    # A joint listed twice for a vertex counts for both, "REPLACE" would only keep one
+    vertexCount = int(vertices.max()) + 1
+    pairs, pairIndices = np.unique(joints * vertexCount + vertices, return_inverse=True)
+    weights = np.bincount(pairIndices.ravel(), weights=weights)
+    joints, vertices = np.divmod(pairs, vertexCount)
+
+    weights = np.round(weights * SKIN_WEIGHT_STEPS) / SKIN_WEIGHT_STEPS
+    used = weights > 0
+    vertices = vertices[used]
+    joints = joints[used]
+    weights = weights[used]
+
+    order = np.lexsort((weights, joints))
+    vertices = vertices[order]
+    joints = joints[order]
+    weights = weights[order]
+
+    pairChanges = np.flatnonzero((np.diff(joints) != 0) | (np.diff(weights) != 0)) + 1
+    starts = np.concatenate(([0], pairChanges))
+    ends = np.concatenate((pairChanges, [len(vertices)]))
+
+    vertexGroups = {}
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if start == end:
+            continue
+        joint = int(joints[start])
+        if joint not in vertexGroups:
+            vertexGroups[joint] = obj.vertex_groups.new(name=getJointName(joint))
+        vertexGroups[joint].add(vertices[start:end].tolist(), float(weights[start]), "REPLACE")
+
+'''
+Export
+'''
+# Normal of every loop as shaded, so flat faces, sharp edges and custom
+# normals come out the way they look rather than smoothed per vertex
+def getCornerNormals(mesh):
+    normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+    if bpy.app.version < (4, 1, 0):
+        mesh.calc_normals_split()
+        mesh.loops.foreach_get("normal", normals)
+    else:
+        mesh.corner_normals.foreach_get("vector", normals)
+    return normals.reshape(-1, 3)
+
+# Polygon group of an object's evaluated, triangulated mesh. Every
+# triangle corner gets its own vertex so per loop UVs survive.
+def buildPolygonGroup(obj, groupID, depsgraph):
+    evaluated = obj.evaluated_get(depsgraph)
+    mesh = evaluated.to_mesh()
+    try:
+        mesh.calc_loop_triangles()
+        triangleLoops = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("loops", triangleLoops)
+
+        loopVertices = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loopVertices)
+        cornerVertices = loopVertices[triangleLoops]
+
+        positions = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", positions)
+
+        attributes = {
+            "VERTEX": positions.reshape(-1, 3)[cornerVertices],
+            "NORMAL": getCornerNormals(mesh)[triangleLoops]
+        }
+        for i, uvLayer in enumerate(mesh.uv_layers[:4]):
+            uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+            uvLayer.data.foreach_get("uv", uvs)
+            uvs = uvs.reshape(-1, 2)[triangleLoops]
+            uvs[:, 1] = 1.0 - uvs[:, 1]
+            attributes[f"TEXCOORD{i}"] = uvs
+    finally:
+        evaluated.to_mesh_clear()
+
+    return PolygonGroup.fromArrays(
+        groupID, attributes, np.arange(len(triangleLoops), dtype=np.uint32)
+    )
@@ -0,0 +1,305 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+import bpy
+from bpy.types import Operator
+from bpy.props import StringProperty, BoolProperty, IntProperty
+from bpy_extras.io_utils import ImportHelper, ExportHelper
+import numpy as np
+from queue import Empty
+import tempfile
+import os
+
+from .FileIO.SCG import writeSCG, writeLODManifest, readLODManifest
+from .FileIO.StreamBuffer import StreamBuffer
+from .Geometry.Weld import weldVertices
+from .Geometry.Optimize import optimizePolygonGroup
+from .Geometry.Split import splitPolygonGroup, compactIndices
+from .Geometry.Decimate import generateLODs
+from .MeshBuilder import buildMesh, buildPolygonGroup, setSkinWeights
+from .Decoder import readNodes, decodeGroup, BackgroundDecoder
+from .Profiler import ImportProfiler
+
+'''
+Operators
+'''
+class ImportDAVA(Operator, ImportHelper):
+    bl_idname = "import_scene.scg"
+    bl_label = "Import DAVA geometry"
+    bl_description = "Import a DAVA scene file"
+
+    filter_glob: StringProperty(default="*.scg;*.scg.dvpl", options={'HIDDEN'})
+    use_cache: BoolProperty(
+        name="Use decode cache",
+        description="Keep decoded geometry on disk so re-importing the same file is faster",
+        default=False
+    )
+    weld_vertices: BoolProperty(
+        name="Weld vertices",
+        description="Merge vertices that were split for UV or normal seams, attributes are kept per face corner",
+        default=False
+    )
+    profile: BoolProperty(
+        name="Profile import",
+        description="Time every import stage and polygon group, the summary is reported and a JSON trace is written to the temporary directory",
+        default=False
+    )
+    background: BoolProperty(
+        name="Load in background",
+        description="Decode on a worker thread and create meshes a few at a time so Blender stays responsive, press Esc to cancel",
+        default=False
+    )
+
+    # Background import: seconds between mesh creation ticks and meshes created per tick
+    TIMER_INTERVAL = 0.02
+    MESHES_PER_TICK = 4
+
+    def invoke(self, context, event):
+        return ImportHelper.invoke(self, context, event)
+
+    # Just import SCG whilst we get proper full imports working
+    def execute(self, context):
+        filepath = self.filepath
+        print(f"Importing DAVA scene from {filepath}")
+
+        # Per group peak memory is meaningless with decoding on another thread
+        self.profiler = ImportProfiler(self.profile, traceMemory=not self.background)
+        self.profiler.start()
+        self.collection = bpy.data.collections.new("DAVAMesh")
+        self.lodLevels = readLODManifest(filepath)
+        if self.background:
+            return self.startBackground(context)
+
+        try:
+            nodes = readNodes(filepath, self.use_cache, self.profiler)
+            for groupID, node in nodes.items():
+                self.profiler.beginGroup(groupID)
+                self.createObject(decodeGroup(groupID, node, self.weld_vertices, self.profiler))
+                self.profiler.endGroup(groupID)
+        except BaseException:
+            # Nothing links the collection or its meshes, don't leave them behind
+            self.removeCollection()
+            raise
+        finally:
+            self.profiler.stop()
+        bpy.context.scene.collection.children.link(self.collection)
+        self.finish(len(nodes))
+
+        return {"FINISHED"}
+
+    def removeCollection(self):
+        for obj in list(self.collection.objects):
+            mesh = obj.data
+            bpy.data.objects.remove(obj)
+            bpy.data.meshes.remove(mesh)
+        bpy.data.collections.remove(self.collection)
+
+    # Add polygon group to scene
+    def createObject(self, decoded):
+        with self.profiler.stage("mesh", decoded.id, decoded.group.vertexData.nbytes + decoded.group.indices.nbytes):
+            mesh = buildMesh("mesh", decoded.group, decoded.weld, decoded.faces)
+            obj = bpy.data.objects.new(f"PolygonGroup{decoded.id}", mesh)
+            setSkinWeights(obj, decoded.group, decoded.weld)
+            # Generated LODs would sit on top of their mesh, they're kept hidden
+            level = self.lodLevels.get(decoded.id, 0)
+            if level:
+                obj.name = f"PolygonGroup{decoded.id}_LOD{level}"
+                obj["dava_lod"] = level
+                obj.hide_viewport = True
+                obj.hide_render = True
+            self.collection.objects.link(obj)
+
+    def finish(self, groupCount):
+        message = f"Loaded {groupCount} polygon groups"
+        if self.profile:
+            tracePath = os.path.join(tempfile.gettempdir(), os.path.basename(self.filepath) + ".trace.json")
+            self.profiler.writeTrace(tracePath)
+            message += f" in {self.profiler.getSummary()}, trace written to {tracePath}"
+            print(message)
+        self.report({"INFO"}, message)
+
+    '''
+    Background import
+    '''
+    def startBackground(self, context):
+        self.decoder = BackgroundDecoder(self.filepath, self.use_cache, self.weld_vertices, self.profiler)
+        self.decoder.start()
+        self.loadedCount = 0
+
+        # Linked straight away so meshes show up as they are created
+        context.scene.collection.children.link(self.collection)
+
+        windowManager = context.window_manager
+        self.timer = windowManager.event_timer_add(self.TIMER_INTERVAL, window=context.window)
+        windowManager.progress_begin(0, 100)
+        windowManager.modal_handler_add(self)
+
+        return {"RUNNING_MODAL"}
+
+    def stopBackground(self, context):
+        self.profiler.stop()
+        windowManager = context.window_manager
+        windowManager.event_timer_remove(self.timer)
+        windowManager.progress_end()
+
+    def modal(self, context, event):
+        if event.type == "ESC":
+            self.decoder.cancel()
+            self.stopBackground(context)
+            self.report({"WARNING"}, f"Import cancelled after {self.loadedCount} polygon groups")
+            return {"CANCELLED"}
+
+        if event.type != "TIMER":
+            return {"PASS_THROUGH"}
+
+        # A few meshes per tick keeps the UI responsive
+        for _ in range(self.MESHES_PER_TICK):
+            try:
+                result = self.decoder.results.get_nowait()
+            except Empty:
+                break
+
+            if result is None:
+                self.stopBackground(context)
+                self.finish(self.loadedCount)
+                return {"FINISHED"}
+            if isinstance(result, Exception):
+                self.stopBackground(context)
+                self.report({"ERROR"}, f"Import failed: {result}")
+                return {"CANCELLED"}
+
+            self.createObject(result)
+            self.loadedCount += 1
+
+        if self.decoder.groupCount:
+            context.window_manager.progress_update(100 * self.loadedCount // self.decoder.groupCount)
+
+        return {"PASS_THROUGH"}
+
+class ExportDAVA(Operator, ExportHelper):
+    bl_idname = "export_scene.scg"
+    bl_label = "Export DAVA geometry"
+    bl_description = "Export the selected meshes as DAVA geometry"
+
+    filter_glob: StringProperty(default="*.scg", options={'HIDDEN'})
+    filename_ext = ".scg"
+    optimize_indices: BoolProperty(
+        name="Optimize for rendering",
+        description="Merge identical vertices and reorder triangles and vertices for the GPU vertex cache",
+        default=True
+    )
+    split_groups: BoolProperty(
+        name="Split large meshes",
+        description="Split meshes with more than 65536 vertices into several polygon groups so all of them use 16 bit indices",
+        default=False
+    )
+    lod_count: IntProperty(
+        name="Generated LODs",
+        description="Also export this many decimated copies of every mesh, each with half the triangles of the one before. Which groups are LODs of which mesh is written to a .lods.json file next to the SCG",
+        default=0,
+        min=0,
+        max=4
+    )
+
+    def invoke(self, context, event):
+        return ExportHelper.invoke(self, context, event)
+
+    def execute(self, context):
+        filepath = self.filepath
+        print(f"Exporting DAVA geometry to {filepath}")
+
+        depsgraph = context.evaluated_depsgraph_get()
+        objects = [obj for obj in context.selected_objects if obj.type == "MESH"]
+        groups = [buildPolygonGroup(obj, groupID, depsgraph) for groupID, obj in enumerate(objects)]
+        # Object and LOD level every group came from
+        sources = [(obj.name, 0) for obj in objects]
+
+        message = ""
+        if self.lod_count:
+            # Exported groups have a vertex per triangle corner, no edge can collapse until they're merged
+            ratios = [0.5 ** level for level in range(1, self.lod_count + 1)]
+            groups = [
+                weldVertices(group, attributes=group.vertexFormat.attributes, attributeTolerance=0).group for group in groups
+            ]
+            groups = [lod for group in groups for lod in [group] + [result.group for result in generateLODs(group, ratios)]]
+            sources = [(name, level) for name, _ in sources for level in range(self.lod_count + 1)]
+
+        if self.optimize_indices:
+            # Exported groups have a vertex per triangle corner, merge the identical ones first
+            results = [
+                optimizePolygonGroup(
+                    weldVertices(group, attributes=group.vertexFormat.attributes, attributeTolerance=0).group
+                ) for group in groups
+            ]
+            groups = [result.group for result in results]
+
+            faceCounts = [group.primitiveCount for group in groups]
+            if sum(faceCounts) > 0:
+                acmrBefore = np.average([result.acmrBefore for result in results], weights=faceCounts)
+                acmrAfter = np.average([result.acmrAfter for result in results], weights=faceCounts)
+                message = f", ACMR {acmrBefore:.3f} -> {acmrAfter:.3f}"
+
+        if self.split_groups:
+            parts = [splitPolygonGroup(group) for group in groups]
+            groups = [part for groupParts in parts for part in groupParts]
+            sources = [source for source, groupParts in zip(sources, parts) for _ in groupParts]
+        else:
+            groups = [compactIndices(group) for group in groups]
+        if self.split_groups or self.lod_count:
+            # Sub-groups and LODs share their parent's ID, number everything again
+            for groupID, group in enumerate(groups):
+                group.id = groupID.to_bytes(8, "little")
+
+        with open(filepath, "wb") as scg:
+            groupCount = writeSCG(
+                StreamBuffer(scg), (group.toArchive() for group in groups)
+            )
+        if self.lod_count:
+            meshes = {}
+            for groupID, (name, level) in enumerate(sources):
+                lods = meshes.setdefault(name, [[] for _ in range(self.lod_count + 1)])
+                lods[level].append(groupID)
+            writeLODManifest(filepath, meshes)
+        self.report({"INFO"}, f"Saved {groupCount} polygon groups{message}")
+
+        return {'FINISHED'}
+
+'''
+Menu
+'''
+def menu_func_import_dava(self, context):
+    self.layout.operator(ImportDAVA.bl_idname, text="DAVA scene (.sc2/.scg)")
+
+def menu_func_export_dava(self, context):
+    self.layout.operator(ExportDAVA.bl_idname, text="DAVA geometry (.scg)")
+
+'''
+Register
+'''
+classes = {
+    ExportDAVA,
+    ImportDAVA
+}
+
+def register():
+    # Register classes
+    for c in classes:
+        bpy.utils.register_class(c)
+    # File > Import-Export
+    bpy.types.TOPBAR_MT_file_import.append(menu_func_import_dava)
+    bpy.types.TOPBAR_MT_file_export.append(menu_func_export_dava)
+
+def unregister():
+    # Unregister classes
+    for c in classes:
+        bpy.utils.unregister_class(c)
+    # Remove `File > Import-Export`
+    bpy.types.TOPBAR_MT_file_import.remove(menu_func_import_dava)
+    bpy.types.TOPBAR_MT_file_export.remove(menu_func_export_dava)
@@ -0,0 +1,136 @@
+'''
+Copyright (C) 2023 Pyogenics <https://www.github.com/Pyogenics>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+from contextlib import contextmanager
+from time import perf_counter
+import json
+import tracemalloc
+
+# Stages of an import in the order they happen
+STAGES = ("read", "parse", "decode", "weld", "primitives", "mesh")
+
+class StageTiming:
+    def __init__(self, stage, groupID, time, size):
+        self.stage = stage
+        # None for stages that cover the whole file
+        self.groupID = groupID
+        self.time = time
+        self.size = size
+
+# Records wall time and bytes of every import stage per polygon group,
+# plus the peak memory of each group. A disabled profiler records nothing
+# so the import code can use it unconditionally.
+class ImportProfiler:
+    def __init__(self, enabled=True, traceMemory=True):
+        self.enabled = enabled
+        self.traceMemory = enabled and traceMemory
+        self.timings = []
+        self.peakMemory = {}
+        self.totalTime = 0.0
+        self.startTime = None
+        self.startedTracing = False
+        self.groupStartMemory = 0
+
+    def start(self):
+        if not self.enabled:
+            return
+        if self.traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.startedTracing = True
+        self.startTime = perf_counter()
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.totalTime = perf_counter() - self.startTime
+        if self.startedTracing:
+            tracemalloc.stop()
+            self.startedTracing = False
+
+    @contextmanager
+    def stage(self, stage, groupID=None, size=0):
+        if not self.enabled:
+            yield
+            return
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append(StageTiming(stage, groupID, perf_counter() - start, size))
+
+    # Peak memory is measured from one group's beginGroup to its endGroup,
+    # on top of what was already allocated when the group began
+    def beginGroup(self, groupID):
+        if self.traceMemory:
+            tracemalloc.reset_peak()
+            self.groupStartMemory = tracemalloc.get_traced_memory()[0]
+
+    def endGroup(self, groupID):
+        if self.traceMemory:
+            self.peakMemory[groupID] = tracemalloc.get_traced_memory()[1] - self.groupStartMemory
+
+    '''
+    Results
+    '''
+    def getStageTotals(self):
+        totals = {stage: [0.0, 0] for stage in STAGES}
+        for timing in self.timings:
+            total = totals.setdefault(timing.stage, [0.0, 0])
+            total[0] += timing.time
+            total[1] += timing.size
+
+        return {stage: tuple(total) for stage, total in totals.items()}
+
+    def getGroupTimes(self):
+        groupTimes = {}
+        for timing in self.timings:
+            if timing.groupID is not None:
+                groupTimes[timing.groupID] = groupTimes.get(timing.groupID, 0.0) + timing.time
+
+        return groupTimes
+
+    # One line, short enough for the operator report
+    def getSummary(self, slowestCount=3):
+        stages = ", ".join(
+            f"{stage} {time * 1e3:.0f}ms" for stage, (time, _) in self.getStageTotals().items() if time > 0
+        )
+        summary = f"{self.totalTime:.2f}s ({stages})"
+
+        groupTimes = self.getGroupTimes()
+        slowest = sorted(groupTimes, key=groupTimes.get, reverse=True)[:slowestCount]
+        if slowest:
+            summary += ", slowest groups " + ", ".join(f"{groupID} {groupTimes[groupID] * 1e3:.0f}ms" for groupID in slowest)
+        if self.peakMemory:
+            summary += f", peak memory {max(self.peakMemory.values()) / 1e6:.1f}MB"
+
+        return summary
+
+    def toDict(self):
+        groups = {}
+        for timing in self.timings:
+            if timing.groupID is None:
+                continue
+            group = groups.setdefault(str(timing.groupID), {"stages": {}})
+            group["stages"][timing.stage] = {"time": timing.time, "bytes": timing.size}
+        for groupID, peakMemory in self.peakMemory.items():
+            groups.setdefault(str(groupID), {"stages": {}})["peakMemory"] = peakMemory
+
+        return {
+            "totalTime": self.totalTime,
+            "stages": {
+                stage: {"time": time, "bytes": size} for stage, (time, size) in self.getStageTotals().items()
+            },
+            "groups": groups
+        }
+
+    def writeTrace(self, filepath):
+        with open(filepath, "w") as file:
+            json.dump(self.toDict(), file, indent=4)